@@ -1,11 +1,12 @@
-from fastapi import FastAPI, UploadFile, File, Query, WebSocket, WebSocketDisconnect, Depends
-from typing import List
-from kg.db.util import check_connection as check_neo4j_connection, load_kg_db
-from kg.db.queries import search_papers_by_id, get_all_papers, get_graph
+from fastapi import FastAPI, UploadFile, File, Query, WebSocket, WebSocketDisconnect, Depends, HTTPException, Request
+from typing import List, Optional
+from neo4j import Driver
+from kg.db.util import check_connection as check_neo4j_connection, create_kg_driver
+from kg.db.queries import search_papers_by_id as query_papers_by_id, get_all_papers, get_graph, get_graph_delta, parse_graph_cursor, stream_graph_page
 from kg.db.kg_manager import KnowledgeGraphManager, KnowledgeGraphInfo
 from rabbit.commands import (
     AddPaperCitations, AddPaperReferences, AddPapersById, 
-    AddPapersByTitle, ClearGraph, PaperTitleWithYear
+    AddPapersByTitle, ClearGraph, CrawlPaperGraph, PaperTitleWithYear
 )
 from rabbit.events import (
     GraphUpdated, ChatMessage, ChatResponse, ResponseCompleted, DocumentCreated, 
@@ -15,12 +16,14 @@ from pathlib import Path
 from rabbit.commands import CreateEmbeddingPlot
 from scholar.api import relevance_search
 from scholar.models import Paper
-from scholar.util import retry
-from rabbit import publish_message, ChannelType, check_connection as check_rabbit_connection, subscribe_to_queue
+from scholar.client import close_client as close_scholar_client
+from scholar.util import RateLimitExceededError
+from rabbit import publish_message, close_publisher, ChannelType, check_connection as check_rabbit_connection, subscribe_to_queue
 from .upload import upload_many
 from .util import transform_for_cytoscape, transform_bibtex_for_cytoscape
 from fastapi.middleware.cors import CORSMiddleware
 from .sockets import ConnectionManager
+from .graph_cache import GraphSnapshotCache
 import bibtexparser
 from contextlib import asynccontextmanager
 import asyncio
@@ -30,7 +33,9 @@ from .types import BibTexPaper, BibTexRequest
 from ollama import Client
 from langchain_ollama.llms import OllamaLLM
 import os
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+import json
 ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
 default_model = os.environ.get("DEFAULT_MODEL", "gemma3:1b")
 
@@ -46,14 +51,19 @@ manager = ConnectionManager()
 def get_connection_manager():
     return manager
 
+graph_cache = GraphSnapshotCache()
+
 async def handle_update_result(message: GraphUpdated):
-    await manager.broadcast("graph_updated", {})
+    version = graph_cache.bump(message.nodeIds)
+    await manager.broadcast("graph_updated", {"version": version, "nodeIds": message.nodeIds})
 
 async def handle_chat_response(message: ChatResponse):
     await manager.broadcast("chat_response", message.model_dump())
 
 async def handle_response_completed(message: ResponseCompleted):
     logger.info(f"Response completed: {message.responseId}")
+    # Chat messages and responses are part of the graph payload
+    graph_cache.bump([message.responseId])
     await manager.broadcast("response_completed", message.model_dump())
 
 async def handle_plot_created(message: EmbeddingPlotCreated):
@@ -70,6 +80,7 @@ async def subscribe_to_rabbitmq():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    app.state.neo4j_driver = create_kg_driver()
     task = asyncio.create_task(subscribe_to_rabbitmq())
     yield
     
@@ -78,16 +89,31 @@ async def lifespan(app: FastAPI):
         await task
     except asyncio.CancelledError:
         pass
+    await close_scholar_client()
+    await close_publisher()
+    app.state.neo4j_driver.close()
     manager.disconnect_all()
 
 app = FastAPI(title="Nexarag API", description="API for managing the Nexarag knowledge graph", lifespan=lifespan)
 
+def get_kg_driver(request: Request) -> Driver:
+    """Shared driver created in lifespan; handlers borrow pooled sessions from it."""
+    return request.app.state.neo4j_driver
+
 @app.websocket("/ws/events/")
 async def websocket_endpoint(websocket: WebSocket, manager: ConnectionManager = Depends(get_connection_manager)):
     await manager.connect(websocket)
     try:
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "graph_delta" and isinstance(request.get("since"), int):
+                db = websocket.app.state.neo4j_driver
+                delta = await asyncio.to_thread(build_graph_delta, db, request["since"])
+                await manager.send(websocket, "graph_delta", jsonable_encoder(delta))
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
@@ -114,26 +140,23 @@ async def add_papers(papers: List[str]):
     return { "message": "Papers added to the queue" }
 
 @app.get("/papers/get/", tags=["Papers"])
-async def get_paper_by_id(id: str = Query(default=None)):
-    loader = load_kg_db()
-    with loader() as db:
-        papers = search_papers_by_id(db, id)
-    return papers
+def get_paper_by_id(id: str = Query(default=None), db: Driver = Depends(get_kg_driver)):
+    return query_papers_by_id(db, id)
 
 @app.get("/papers/search/", tags=["Papers"])
-async def search_papers_by_id(id: str = Query(default=None)):
-    loader = load_kg_db()
-    with loader() as db:
-        papers = search_papers_by_id(db, id)
-    return papers
+def search_papers_by_id(id: str = Query(default=None), db: Driver = Depends(get_kg_driver)):
+    return query_papers_by_id(db, id)
 
-def handle_rate_limit_exceeded(manager:ConnectionManager, e):
-    manager.broadcast("error", { "message": "Rate limit exceeded. Re-attempting..."})
+async def handle_rate_limit_exceeded(manager:ConnectionManager, e):
+    await manager.broadcast("error", { "message": "Rate limit exceeded. Please try again later."})
 
 @app.get("/papers/search/relevance/", tags=["Papers"])
 async def relevance_search_papers(query: str = Query(default=''), manager: ConnectionManager = Depends(get_connection_manager)):
-    results = retry(relevance_search, query, cb=lambda e: handle_rate_limit_exceeded(manager, e))
-    return results
+    try:
+        return await relevance_search(query)
+    except RateLimitExceededError as e:
+        await handle_rate_limit_exceeded(manager, e)
+        raise HTTPException(status_code=429, detail=str(e))
 
 @app.post("/papers/add/", tags=["Papers"])
 async def add_papers_by_id(paper_ids: List[str]):
@@ -142,11 +165,8 @@ async def add_papers_by_id(paper_ids: List[str]):
     return { "message": "Papers added to the queue" }
 
 @app.get("/papers/get/all/", tags=["Papers"])
-async def get_papers():
-    loader = load_kg_db()
-    with loader() as db:
-        papers = get_all_papers(db)
-    return papers
+def get_papers(db: Driver = Depends(get_kg_driver)):
+    return get_all_papers(db)
 
 @app.post("/papers/bibtex/", tags=["Papers"])
 async def add_papers_bibtex(req: BibTexRequest):
@@ -171,25 +191,61 @@ async def add_papers_bibtex(req: BibTexRequest):
     return transform_bibtex_for_cytoscape(papers)
 
 @app.post("/papers/citations/add/", tags=["Papers"])
-async def add_citations(paper_ids: List[str]):
-    message = AddPaperCitations(paper_ids=paper_ids)
+async def add_citations(paper_ids: List[str], limit: Optional[int] = None):
+    message = AddPaperCitations(paper_ids=paper_ids, limit=limit)
     await publish_message(ChannelType.ADD_CITATIONS, message)
     return { "message": "Citations added to the queue" }
 
 @app.post("/papers/references/add/", tags=["Papers"])
-async def add_references(paper_ids: List[str]):
-    message = AddPaperReferences(paper_ids=paper_ids)
+async def add_references(paper_ids: List[str], limit: Optional[int] = None):
+    message = AddPaperReferences(paper_ids=paper_ids, limit=limit)
     await publish_message(ChannelType.ADD_REFERENCES, message)
     return { "message": "Citations added to the queue" }
 
+@app.post("/papers/crawl/", tags=["Papers"])
+async def crawl_papers(message: CrawlPaperGraph):
+    await publish_message(ChannelType.CRAWL_PAPERS, message)
+    return { "message": "Crawl added to the queue" }
+
 ######################## Graph ########################
 
 @app.get("/graph/get/", tags=["Graph"])
-def get_whole_graph():
-    loader = load_kg_db()
-    with loader() as db:
-        graph = get_graph(db)
-    return transform_for_cytoscape(graph)
+async def get_whole_graph(request: Request, db: Driver = Depends(get_kg_driver)):
+    if graph_cache.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers={"ETag": graph_cache.etag, "Cache-Control": "no-cache"})
+    version, graph = await graph_cache.get(lambda: jsonable_encoder(transform_for_cytoscape(get_graph(db))))
+    headers = {"ETag": graph_cache.etag_for(version), "Cache-Control": "no-cache", "X-Graph-Version": str(version)}
+    return JSONResponse(graph, headers=headers)
+
+def build_graph_delta(db: Driver, since: int):
+    version = graph_cache.version
+    node_ids = graph_cache.changes_since(since)
+    if node_ids is None:
+        return {"since": since, "version": version, "full": True, "nodes": [], "edges": []}
+    graph = transform_for_cytoscape(get_graph_delta(db, node_ids)) if node_ids else {"nodes": [], "edges": []}
+    return {"since": since, "version": version, "full": False, **graph}
+
+@app.get("/graph/delta/", tags=["Graph"])
+def get_graph_changes(since: int = Query(...), db: Driver = Depends(get_kg_driver)):
+    """Nodes and edges changed since a graph version; `full` means the client must reload the graph."""
+    return build_graph_delta(db, since)
+
+@app.get("/graph/stream/", tags=["Graph"])
+def stream_whole_graph(
+    cursor: Optional[str] = Query(default=None),
+    page_size: int = Query(default=5000, ge=1, le=50000),
+    include: List[str] = Query(default=[]),
+    db: Driver = Depends(get_kg_driver),
+):
+    """Stream one page of the graph as NDJSON, omitting embeddings and abstracts unless included."""
+    if cursor:
+        try:
+            parse_graph_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    items = stream_graph_page(db, cursor=cursor, page_size=page_size, include=include)
+    lines = (json.dumps(item, default=str) + "\n" for item in items)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 @app.post("/graph/clear/", tags=["Graph"])
 async def remove_whole_graph():
@@ -280,8 +336,8 @@ def list_available_files():
 ######################## Health ########################
 
 @app.get("/neo4j/health/", tags=["Health"])
-def test_neo4j_connection():
-    success = check_neo4j_connection()
+def test_neo4j_connection(db: Driver = Depends(get_kg_driver)):
+    success = check_neo4j_connection(db)
     return { "message": f"Connection {'successful' if success else 'failed'}" }
     
 @app.get("/rabbit/health/", tags=["Health"])
@@ -329,6 +385,7 @@ def export_knowledge_graph(name: str, description: str = None):
 def import_knowledge_graph(name: str):
     """Import a knowledge graph from a dump file."""
     success = kg_manager.import_knowledge_graph(name)
+    graph_cache.bump()
     if success:
         return {"message": f"Knowledge graph '{name}' imported successfully", "success": True}
     else:
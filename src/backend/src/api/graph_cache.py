@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Any, Callable, Iterable, Optional, Set, Tuple
+import asyncio
+import os
+import time
+
+GRAPH_CHANGE_LOG_SIZE = int(os.getenv("GRAPH_CHANGE_LOG_SIZE", 1000))
+
+class GraphSnapshotCache:
+    """
+    In-process snapshot of the cytoscape graph payload keyed by a graph version counter.
+    The version is bumped whenever the worker reports a graph change; concurrent requests for
+    a stale snapshot share a single load instead of each querying Neo4j.
+    """
+    def __init__(self, change_log_size: int = GRAPH_CHANGE_LOG_SIZE):
+        # Start from the wall clock so versions (and ETags) keep increasing across API restarts
+        self.version = time.time_ns() // 1_000_000
+        self._snapshot: Optional[Tuple[int, Any]] = None
+        self._lock = asyncio.Lock()
+        self._changes = deque(maxlen=change_log_size)
+
+    def bump(self, node_ids: Optional[Iterable[str]] = None) -> int:
+        """Advance the version, recording which node ids changed (None when the scope is unknown)."""
+        self.version += 1
+        node_ids = set(node_ids) if node_ids else None
+        self._changes.append((self.version, node_ids))
+        return self.version
+
+    def changes_since(self, since: int) -> Optional[Set[str]]:
+        """
+        Node ids changed after version `since`, or None when the client must reload the whole
+        graph (unknown or evicted version, or a change without node ids such as a clear).
+        """
+        if since == self.version:
+            return set()
+        if since > self.version or not self._changes or since < self._changes[0][0] - 1:
+            return None
+        changed = set()
+        for version, node_ids in self._changes:
+            if version <= since:
+                continue
+            if node_ids is None:
+                return None
+            changed |= node_ids
+        return changed
+
+    def etag_for(self, version: int) -> str:
+        return f'"graph-{version}"'
+
+    @property
+    def etag(self) -> str:
+        return self.etag_for(self.version)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+    async def get(self, load: Callable[[], Any]) -> Tuple[int, Any]:
+        """Return (version, payload), running the blocking `load` in a thread when the snapshot is stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == self.version:
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot[0] == self.version:
+                return snapshot
+            # Tag with the version seen before loading so a bump during the load forces a reload
+            version = self.version
+            payload = await asyncio.to_thread(load)
+            self._snapshot = (version, payload)
+            return self._snapshot
@@ -19,6 +19,9 @@ class ConnectionManager:
         for connection in self.active_connections:
             connection.close()
 
+    async def send(self, websocket: WebSocket, event_type: str, data: Dict):
+        await websocket.send_json({"type": event_type, "body": data})
+
     async def broadcast(self, event_type: str, data: Dict):
         message = {"type": event_type, "body": data}
         for connection in self.active_connections:
@@ -1,8 +1,10 @@
 from kg.db.models import Paper, PublicationVenue, Journal, Author, Project
-from typing import List
-from scholar.api import enrich_papers, enrich_authors, get_citations, get_references
-from scholar.util import retry
-from kg.llm.embeddings import create_abstract_embedding
+from typing import List, Optional
+from scholar.api import enrich_papers, enrich_authors, iter_citations, iter_references
+from scholar.util import read_ahead
+from kg.llm.embeddings import create_abstract_embeddings
+from kg.db.writer import DEFAULT_BATCH_SIZE, write_citations, write_paper_authors, write_paper_journals, write_paper_venues
+import asyncio
 import os
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text:v1.5")
@@ -11,7 +13,7 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MODEL):
+async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MODEL, batch_size: int = DEFAULT_BATCH_SIZE):
     paper_dicts = []
     author_dicts = {}
     journal_dicts = {}
@@ -29,18 +31,11 @@ async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MOD
         return
     
     # Enrich papers
-    papers = retry(enrich_papers, new_paper_ids)
+    papers = await enrich_papers(new_paper_ids)
     all_author_ids = set()
     for paper_data in papers:
-        if paper_data.abstract is not None:
-            try: 
-                abstract_embedding = create_abstract_embedding(paper_data.abstract, model_id)
-            except Exception as e:
-                logger.error(f"Error creating abstract embedding for paperId: {paper_data.paperId}: {e}")
-                abstract_embedding = None
-        else:
-            abstract_embedding = None
-
+        if paper_data is None:
+            continue
         paper_dicts.append({
             "paper_id": paper_data.paperId,
             "title": paper_data.title.strip() if paper_data.title else "Untitled Paper",
@@ -51,7 +46,7 @@ async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MOD
             "influential_citation_count": paper_data.influentialCitationCount,
             "publication_types": paper_data.publicationTypes,
             "publication_date": paper_data.publicationDate,
-            "abstract_embedding": abstract_embedding,
+            "abstract_embedding": None,
         })
 
         for author in paper_data.authors:
@@ -83,9 +78,19 @@ async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MOD
                 }
             paper_venue_relations.append((paper_data.paperId, venue_id))
 
-    # Enrich authors once for all unique author IDs
-    enriched_authors = retry(enrich_authors, list(all_author_ids))
+    # Embed abstracts in batches while authors are enriched once for all unique author IDs
+    embedded_papers = [paper for paper in paper_dicts if paper["abstract"] is not None]
+    abstract_embeddings, enriched_authors = await asyncio.gather(
+        create_abstract_embeddings([paper["abstract"] for paper in embedded_papers], model_id),
+        enrich_authors(list(all_author_ids)),
+    )
+    for paper, embedding in zip(embedded_papers, abstract_embeddings):
+        if embedding is None:
+            logger.error(f"Error creating abstract embedding for paperId: {paper['paper_id']}")
+        paper["abstract_embedding"] = embedding
     for author_data in enriched_authors:
+        if author_data is None:
+            continue
         author_dicts[author_data.authorId] = {
             "author_id": author_data.authorId,
             "name": author_data.name,
@@ -105,78 +110,41 @@ async def create_paper_graph(paper_ids: List[str], model_id: str = EMBEDDING_MOD
     except:
         logger.error("Error creating or updating nodes in the graph database")
 
-    for paper_id, author_id in paper_author_relations:
-        try:
-            paper = await Paper.nodes.get_or_none(paper_id=paper_id)
-            author = await Author.nodes.get_or_none(author_id=author_id)
-            if paper and author:
-                await author.papers.connect(paper)
-        except:
-            logger.error(f"Error connecting author {author_id} to paper {paper_id}")
-
-    for paper_id, journal_name in paper_journal_relations:
-        try:
-            paper = await Paper.nodes.get_or_none(paper_id=paper_id)
-            journal = await Journal.nodes.get_or_none(name=journal_name)
-            if paper and journal:
-                await paper.journal.connect(journal)
-        except:
-            logger.error(f"Error connecting journal {journal_name} to paper {paper_id}")
-
-    for paper_id, venue_id in paper_venue_relations:
-        try:
-            paper = await Paper.nodes.get_or_none(paper_id=paper_id)
-            venue = await PublicationVenue.nodes.get_or_none(venue_id=venue_id)
-            if paper and venue:
-                await paper.publication_venue.connect(venue)
-        except:
-            logger.error(f"Error connecting venue {venue_id} to paper {paper_id}")
-
-
-async def add_citations(paper_ids):
-    await create_paper_graph(paper_ids)
-
-    paper_dict = {}
+    await write_paper_authors(paper_author_relations, batch_size)
+    await write_paper_journals(paper_journal_relations, batch_size)
+    await write_paper_venues(paper_venue_relations, batch_size)
 
-    all_citations = []
-    for paper_id in paper_ids:
-        citations = retry(get_citations, paper_id)
-        citation_ids = [reference.paperId for reference in citations]
-        all_citations.extend(citation_ids)
-
-        for citation_id in citation_ids:
-            if citation_id not in paper_dict:
-                paper_dict[citation_id] = paper_id
-    
-    await create_paper_graph(all_citations)
 
-    for paper_id, citation_id in paper_dict.items():
-        paper = await Paper.nodes.get_or_none(paper_id=paper_id)
-        reference = await Paper.nodes.get_or_none(paper_id=citation_id)
-        if paper and reference:
-            await paper.citations.connect(reference)
-    
-    return list(paper_dict.keys())
-
-async def add_references(paper_ids):
+async def add_citations(paper_ids, max_results: Optional[int] = None):
+    """
+    Add the papers citing each of `paper_ids`, page by page: each page is enriched and written
+    while the next one downloads. `max_results` caps the citations fetched per paper.
+    """
     await create_paper_graph(paper_ids)
 
-    paper_dict = {}
+    added = {}
+    for paper_id in paper_ids:
+        async for page in read_ahead(iter_citations(paper_id, max_results)):
+            citation_ids = [citation.paperId for citation in page]
+            await create_paper_graph(citation_ids)
+            await write_citations([(citation_id, paper_id) for citation_id in citation_ids])
+            added.update(dict.fromkeys(citation_ids))
+
+    return list(added)
+
+async def add_references(paper_ids, max_results: Optional[int] = None):
+    """
+    Add the papers referenced by each of `paper_ids`, page by page: each page is enriched and
+    written while the next one downloads. `max_results` caps the references fetched per paper.
+    """
+    await create_paper_graph(paper_ids)
 
+    added = {}
     for paper_id in paper_ids:
-        references = get_references(paper_id)
-        reference_ids = [reference.paperId for reference in references]
-        
-        await create_paper_graph(reference_ids)
-
-        for reference_id in reference_ids:
-            if reference_id not in paper_dict:
-                paper_dict[reference_id] = paper_id
-    
-    for paper_id, reference_id in paper_dict.items():
-        paper = await Paper.nodes.get(paper_id=paper_id)
-        reference = await Paper.nodes.get(paper_id=reference_id)
-        if paper and reference:
-            await paper.references.connect(reference)
+        async for page in read_ahead(iter_references(paper_id, max_results)):
+            reference_ids = [reference.paperId for reference in page]
+            await create_paper_graph(reference_ids)
+            await write_citations([(paper_id, reference_id) for reference_id in reference_ids])
+            added.update(dict.fromkeys(reference_ids))
 
-    return list(paper_dict.keys())
\ No newline at end of file
+    return list(added)
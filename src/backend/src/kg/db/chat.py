@@ -1,21 +1,69 @@
-from kg.db.models import ChatResponse, ChatMessage
-from rabbit.events import ChatMessage as RabbitChatMessage, ChatResponse as RabbitChatResponse
+from kg.db.models import ChatMessage
+from rabbit.events import ChatMessage as RabbitChatMessage
+from neomodel import adb
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CHAT_RESPONSE_PERSIST_INTERVAL = float(os.getenv("CHAT_RESPONSE_PERSIST_INTERVAL", 2.0))
+
+# Appends server-side and links the response once, so a write costs one round trip and only
+# carries the new text
+APPEND_RESPONSE_QUERY = """
+    MERGE (r:ChatResponse {response_id: $response_id})
+    SET r.message = coalesce(r.message, '') + $text
+    WITH r
+    OPTIONAL MATCH (m:ChatMessage {message_id: $message_id})
+    FOREACH (_ IN CASE WHEN m IS NULL THEN [] ELSE [1] END | MERGE (r)-[:RESPONSE_TO]->(m))
+    RETURN size(r.message) AS length
+"""
 
 async def create_chat_message(message: RabbitChatMessage):
     message = await ChatMessage(message_id=message.messageId, message=message.message).save()
-    return message    
-
-async def update_chat_response(response: RabbitChatResponse):
-    chat_message = await ChatMessage.nodes.get_or_none(message_id=response.userMessageId)
-    existing_response = await ChatResponse.nodes.get_or_none(response_id=response.responseId)
-
-    if existing_response:
-        existing_response.message += f" {response.message}"
-        await existing_response.save()
-        chat_response = existing_response
-    else:
-        chat_response = await ChatResponse(message=response.message, response_id=response.responseId).save()
-
-    if chat_message:
-        await chat_response.response_to.connect(chat_message)
-    return chat_response
+    return message
+
+async def append_chat_response(response_id: str, message_id: str, text: str) -> int:
+    """Append `text` to the response, creating and linking it on first write. Returns the stored length."""
+    records, _ = await adb.cypher_query(
+        APPEND_RESPONSE_QUERY,
+        {"response_id": response_id, "message_id": message_id, "text": text},
+    )
+    return records[0][0] if records else 0
+
+class ChatResponseWriter:
+    """
+    Buffers one streamed response and appends it to Neo4j at most every `interval` seconds,
+    so a crash loses at most one interval of the answer. The first fragment is written
+    immediately so the response node exists while it streams; `close` writes the remainder.
+    """
+    def __init__(self, response_id: str, message_id: str, interval: float = CHAT_RESPONSE_PERSIST_INTERVAL):
+        self.response_id = response_id
+        self.message_id = message_id
+        self.interval = interval
+        self.writes = 0
+        self._buffer = []
+        self._written_at = None
+
+    async def append(self, text: str):
+        self._buffer.append(text)
+        if self._written_at is None or time.monotonic() - self._written_at >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._written_at = time.monotonic()
+        try:
+            await append_chat_response(self.response_id, self.message_id, text)
+            self.writes += 1
+        except Exception as e:
+            # Keep the text so the next flush retries it
+            self._buffer.insert(0, text)
+            logger.error(f"Error persisting chat response {self.response_id}: {e}")
+
+    async def close(self):
+        await self.flush()
@@ -0,0 +1,104 @@
+"""
+Multi-hop citation crawler.
+Expands seed papers breadth-first along citations and/or references. Each level of the frontier
+is fetched concurrently, and its new papers and CITES edges are written in one batch per level.
+"""
+
+from typing import Awaitable, Callable, List, Optional, Tuple
+from scholar.api import iter_citations, iter_references
+from kg.db.builder import create_paper_graph
+from kg.db.writer import write_citations
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 8))
+CRAWL_MAX_PAPERS = int(os.getenv("CRAWL_MAX_PAPERS", 5000))
+
+LINK_FIELDS = "paperId,title,citationCount"
+
+async def _linked_papers(paper_id: str, direction: str, fan_out: Optional[int], min_citation_count: Optional[int]) -> List[Tuple[str, str, str]]:
+    """(citing id, cited id, linked id) for up to `fan_out` citations and/or references of `paper_id`."""
+    links = []
+    if direction in ("citations", "both"):
+        async for page in iter_citations(paper_id, fan_out, fields=LINK_FIELDS):
+            links.extend((p.paperId, paper_id, p.paperId) for p in page if _keep(p, min_citation_count))
+    if direction in ("references", "both"):
+        async for page in iter_references(paper_id, fan_out, fields=LINK_FIELDS):
+            links.extend((paper_id, p.paperId, p.paperId) for p in page if _keep(p, min_citation_count))
+    return links
+
+def _keep(paper, min_citation_count: Optional[int]) -> bool:
+    return min_citation_count is None or (paper.citationCount or 0) >= min_citation_count
+
+async def crawl_paper_graph(
+    paper_ids: List[str],
+    depth: int = 1,
+    direction: str = "references",
+    fan_out: Optional[int] = 50,
+    min_citation_count: Optional[int] = None,
+    concurrency: int = CRAWL_CONCURRENCY,
+    max_papers: int = CRAWL_MAX_PAPERS,
+    on_level: Optional[Callable[[List[str]], Awaitable]] = None,
+) -> List[str]:
+    """
+    Breadth-first crawl from `paper_ids` for `depth` hops.
+
+    At most `concurrency` papers of a level are expanded at once and each contributes at most
+    `fan_out` linked papers, optionally only those with `min_citation_count` citations. Papers
+    already in the graph are not enriched again but are still expanded. The crawl stops adding
+    papers once `max_papers` have been visited. `on_level` is awaited at each level with the
+    new papers and the endpoints of the links written.
+
+    Returns:
+        The ids of every paper visited, seeds included.
+    """
+    seeds = list(dict.fromkeys(paper_ids))
+    await create_paper_graph(seeds)
+    if on_level is not None:
+        await on_level(seeds)
+
+    visited = dict.fromkeys(seeds)
+    frontier = seeds
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def expand(paper_id: str):
+        async with semaphore:
+            try:
+                return await _linked_papers(paper_id, direction, fan_out, min_citation_count)
+            except Exception as e:
+                logger.error(f"Error expanding paper {paper_id}: {e}")
+                return []
+
+    for level in range(1, depth + 1):
+        if not frontier:
+            break
+        results = await asyncio.gather(*(expand(paper_id) for paper_id in frontier))
+
+        edges = []
+        discovered = []
+        for links in results:
+            for citing_id, cited_id, linked_id in links:
+                if linked_id not in visited:
+                    if len(visited) >= max_papers:
+                        continue
+                    visited[linked_id] = None
+                    discovered.append(linked_id)
+                edges.append((citing_id, cited_id))
+
+        logger.info(f"Crawl level {level}: expanded {len(frontier)} papers, discovered {len(discovered)} new papers and {len(edges)} links")
+        await create_paper_graph(discovered)
+        await write_citations(edges)
+        if on_level is not None:
+            # Edges between papers visited earlier are new too, so their endpoints are reported
+            # along with the new papers for graph deltas to pick them up
+            await on_level(list(dict.fromkeys(discovered + [paper_id for edge in edges for paper_id in edge])))
+
+        if len(visited) >= max_papers:
+            logger.info(f"Crawl stopped after reaching {max_papers} papers")
+            break
+        frontier = discovered
+
+    return list(visited)
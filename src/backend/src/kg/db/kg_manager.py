@@ -31,6 +31,13 @@ class KnowledgeGraphManager:
         self.metadata_file = self.dumps_directory / "kg_metadata.json"
         self.config = load_config()
         self.import_directory = Path("/var/lib/neo4j/import")
+        self._kg = None
+
+    def _get_kg(self):
+        """Reuse one Neo4jGraph (and its connection pool) instead of reconnecting on every call."""
+        if self._kg is None:
+            self._kg = load_kg(self.config, refresh_schema=False)
+        return self._kg
         
     def _copy_to_dumps(self, filename: str) -> bool:
         """Copy a file from Neo4j import directory to dumps directory."""
@@ -117,7 +124,7 @@ class KnowledgeGraphManager:
         """Export current knowledge graph using APOC procedures."""
         try:
             # Get Neo4j connection
-            kg = load_kg(self.config)
+            kg = self._get_kg()
             
             # APOC exports to import directory, which is now mounted as dumps volume
             export_filename = self.format_export_name(name)
@@ -176,7 +183,7 @@ class KnowledgeGraphManager:
                 return False
             
             # Get Neo4j connection
-            kg = load_kg(self.config)
+            kg = self._get_kg()
             
             # Clear existing data first
             logger.info("Clearing existing graph data...")
@@ -235,7 +242,7 @@ class KnowledgeGraphManager:
     def get_current_kg_info(self) -> Dict[str, any]:
         """Get information about the currently active knowledge graph."""
         try:
-            kg = load_kg(self.config)
+            kg = self._get_kg()
             
             # Get basic stats about the current graph
             stats_query = """
@@ -333,7 +340,7 @@ class KnowledgeGraphManager:
     def get_current_kg_info(self) -> Dict[str, any]:
         """Get information about the currently active knowledge graph."""
         try:
-            kg = load_kg(self.config)
+            kg = self._get_kg()
             
             # Get basic stats about the current graph
             stats_query = """
@@ -1,5 +1,12 @@
 from .util import run_query
-from neomodel import db
+from .models import Chunk, Paper
+from neomodel import adb
+import logging
+import numpy as np
+import os
+import time
+
+logger = logging.getLogger(__name__)
 
 def get_all_papers(kg):
     cypher = """
@@ -31,6 +38,105 @@ def get_graph(kg):
     
     return relationships + isolated
 
+GRAPH_LABELS = ("Paper", "Author", "Document", "PublicationVenue", "Journal", "ChatMessage", "ChatResponse")
+DEFAULT_EXCLUDED_PROPERTIES = ("abstract_embedding", "textEmbedding", "abstract")
+
+def _label_filter(var):
+    return "(" + " OR ".join(f"{var}:{label}" for label in GRAPH_LABELS) + ")"
+
+# Unique, indexed property of each graph label. Pages are read label by label in key order, so
+# every page is an index range seek rather than a scan and sort of the whole graph.
+GRAPH_PAGE_KEYS = (
+    ("Paper", "paper_id"),
+    ("Author", "author_id"),
+    ("Document", "document_id"),
+    ("PublicationVenue", "venue_id"),
+    ("Journal", "name"),
+    ("ChatMessage", "message_id"),
+    ("ChatResponse", "response_id"),
+)
+CURSOR_SEPARATOR = "|"
+
+def graph_node_page_query(label, key, after):
+    # Properties are returned as [key, value] pairs so excluded keys (embeddings) never leave the database
+    condition = f"n.{key} > $cursor" if after else f"n.{key} IS NOT NULL"
+    return f"""
+    MATCH (n:{label})
+    WHERE {condition}
+    WITH n ORDER BY n.{key} LIMIT $limit
+    RETURN elementId(n) AS id, labels(n)[0] AS label, n.{key} AS key,
+           [k IN keys(n) WHERE NOT k IN $exclude | [k, n[k]]] AS properties
+"""
+
+GRAPH_EDGE_PAGE_QUERY = f"""
+    MATCH (n)-[r]->(m)
+    WHERE elementId(n) IN $ids AND {_label_filter("m")}
+    RETURN elementId(n) AS source, elementId(m) AS target, type(r) AS type, properties(r) AS properties
+"""
+
+def parse_graph_cursor(cursor):
+    """Split a `<label>|<key>` page cursor, rejecting labels that are not paged."""
+    label, separator, key = cursor.partition(CURSOR_SEPARATOR)
+    if not separator or label not in dict(GRAPH_PAGE_KEYS):
+        raise ValueError(f"Invalid graph cursor: {cursor}")
+    return label, key
+
+def stream_graph_page(kg, cursor=None, page_size=5000, include=()):
+    """
+    Yield one page of the graph as cytoscape items while the Neo4j cursors produce them.
+    Nodes are paged label by label on each label's unique key, resuming after the `<label>|<key>`
+    cursor; each page is followed by the outgoing edges of its nodes and a final `page` item
+    carrying the cursor for the next page (None on the last page).
+    """
+    exclude = [prop for prop in DEFAULT_EXCLUDED_PROPERTIES if prop not in set(include or ())]
+    labels = [label for label, _ in GRAPH_PAGE_KEYS]
+    start, after = (parse_graph_cursor(cursor) if cursor else (labels[0], None))
+    node_ids = []
+    last = None
+    with kg.session() as session:
+        for label, key in GRAPH_PAGE_KEYS[labels.index(start):]:
+            remaining = page_size - len(node_ids)
+            if remaining <= 0:
+                break
+            nodes = session.run(graph_node_page_query(label, key, after is not None), cursor=after, limit=remaining, exclude=exclude)
+            for record in nodes:
+                node_ids.append(record["id"])
+                last = (label, record["key"])
+                yield {"type": "node", "data": {
+                    "id": record["id"],
+                    "label": record["label"],
+                    "properties": dict(record["properties"]),
+                }}
+            after = None
+        if node_ids:
+            edges = session.run(GRAPH_EDGE_PAGE_QUERY, ids=node_ids)
+            for record in edges:
+                yield {"type": "edge", "data": {
+                    "source": record["source"],
+                    "target": record["target"],
+                    "type": record["type"],
+                    "properties": dict(record["properties"]),
+                }}
+    next_cursor = f"{last[0]}{CURSOR_SEPARATOR}{last[1]}" if len(node_ids) == page_size else None
+    yield {"type": "page", "data": {"count": len(node_ids), "next_cursor": next_cursor}}
+
+# Changed nodes are identified by the ids carried in GraphUpdated; edges keep their stored direction
+GRAPH_DELTA_QUERY = f"""
+    MATCH (p)
+    WHERE (p:Paper AND p.paper_id IN $node_ids)
+       OR (p:Document AND p.document_id IN $node_ids)
+       OR (p:ChatResponse AND p.response_id IN $node_ids)
+    OPTIONAL MATCH (p)-[r]-(o)
+    WHERE {_label_filter("o")}
+    RETURN CASE WHEN r IS NULL THEN p ELSE startNode(r) END AS n,
+           r,
+           CASE WHEN r IS NULL THEN null ELSE endNode(r) END AS m
+"""
+
+def get_graph_delta(kg, node_ids):
+    """Changed nodes with all of their relationships, in the same row shape as get_graph."""
+    return run_query(kg, GRAPH_DELTA_QUERY, params={'node_ids': list(node_ids)})
+
 def search_papers_by_id(kg, paper_id):
     cypher = """
     MATCH (p:Paper {paper_id: $paper_id})
@@ -48,55 +154,131 @@ def search_papers_by_title(kg, searchTerm):
     result = run_query(kg, cypher, params={'searchTerm': searchTerm})
     return result
 
-def retrieve_similar_chunks(embedding, k=30):
-    query = """
-        MATCH (c:Chunk)
-        WITH DISTINCT c, vector.similarity.cosine(c.textEmbedding, $embedding) AS score
-        WHERE score > 0.5 
-        ORDER BY score DESC LIMIT $k
-        RETURN c.text AS text, score, c.source AS source, c.chunkId AS chunkId
-    """
+def vector_index_name(model, property_name):
+    # Matches the names neomodel uses when installing VectorIndex declarations
+    return f"vector_index_{model.__label__}_{property_name}"
+
+CHUNK_VECTOR_INDEX = vector_index_name(Chunk, "textEmbedding")
+ABSTRACT_VECTOR_INDEX = vector_index_name(Paper, "abstract_embedding")
+SHOW_VECTOR_INDEXES_QUERY = "SHOW INDEXES YIELD name, type, state WHERE type = 'VECTOR' AND state = 'ONLINE' RETURN name"
+
+# Indexes created on an existing corpus are POPULATING for a while, so a missing index is
+# looked up again once this many seconds have passed
+VECTOR_INDEX_RECHECK_INTERVAL = float(os.getenv("VECTOR_INDEX_RECHECK_INTERVAL", 30))
+
+_online_vector_indexes = None
+_vector_indexes_checked_at = 0.0
+
+async def ensure_vector_indexes():
+    """Install the vector indexes declared on Chunk and Paper and cache which ones are online."""
+    global _online_vector_indexes, _vector_indexes_checked_at
+    for model in (Chunk, Paper):
+        try:
+            await adb.install_labels(model)
+        except Exception as e:
+            logger.error(f"Error installing indexes for {model.__name__}: {e}")
+    try:
+        results, _ = await adb.cypher_query(SHOW_VECTOR_INDEXES_QUERY)
+        _online_vector_indexes = {row[0] for row in results}
+        _vector_indexes_checked_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Error listing vector indexes: {e}")
+        _online_vector_indexes = None
+    return _online_vector_indexes
+
+async def has_vector_index(index_name):
+    global _online_vector_indexes, _vector_indexes_checked_at
+    # Online indexes stay online, so only a missing index is worth looking up again
+    stale = time.monotonic() - _vector_indexes_checked_at >= VECTOR_INDEX_RECHECK_INTERVAL
+    if _online_vector_indexes is None or (index_name not in _online_vector_indexes and stale):
+        try:
+            results, _ = await adb.cypher_query(SHOW_VECTOR_INDEXES_QUERY)
+            _online_vector_indexes = {row[0] for row in results}
+        except Exception as e:
+            logger.error(f"Error listing vector indexes: {e}")
+            return False
+        finally:
+            _vector_indexes_checked_at = time.monotonic()
+    return index_name in _online_vector_indexes
+
+def _vector(values):
+    # float32 arrays are a fraction of the size of lists of Python floats, which matters for
+    # results kept in the retrieval cache
+    return np.asarray(values, dtype=np.float32) if values is not None else None
+
+async def retrieve_similar_chunks(embedding, k=30):
+    if await has_vector_index(CHUNK_VECTOR_INDEX):
+        query = """
+            CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node AS c, score
+            WHERE score > 0.5
+            RETURN c.text AS text, score, c.source AS source, c.chunkId AS chunkId,
+                   c.textEmbedding AS embedding, [(c)-[:NEXT]->(n) | n.chunkId][0] AS nextChunkId
+            ORDER BY score DESC
+        """
+    else:
+        logger.warning(f"Vector index {CHUNK_VECTOR_INDEX} is missing, falling back to a full scan")
+        query = """
+            MATCH (c:Chunk)
+            WITH DISTINCT c, vector.similarity.cosine(c.textEmbedding, $embedding) AS score
+            WHERE score > 0.5 
+            ORDER BY score DESC LIMIT $k
+            RETURN c.text AS text, score, c.source AS source, c.chunkId AS chunkId,
+                   c.textEmbedding AS embedding, [(c)-[:NEXT]->(n) | n.chunkId][0] AS nextChunkId
+        """
     
-    results, meta = db.cypher_query(
+    results, meta = await adb.cypher_query(
         query, 
-        {'embedding': embedding, 'k': k}
+        {'embedding': embedding, 'k': k, 'index': CHUNK_VECTOR_INDEX}
     )
     
     return [
         {
             'text': row[0],
             'score': row[1],
+            'embedding': _vector(row[4]),
             'metadata': {
                 'source': row[2],
-                'chunkId': row[3]
+                'chunkId': row[3],
+                'nextChunkId': row[5]
             }
         }
         for row in results
     ]
 
-def retrieve_similar_abstracts(embedding, k=30):
-    query = """
-        MATCH (p:Paper)
-        WHERE p.abstract IS NOT NULL AND p.title IS NOT NULL
-        WITH DISTINCT p, vector.similarity.cosine(p.abstract_embedding, $embedding) AS score
-        WHERE score > 0.5 
-        ORDER BY score DESC LIMIT $k
-        RETURN 'Title: ' + p.title + '\\n\\n' + 'Abstract: ' + p.abstract AS text, 
-               score, p.paper_id AS paper_id
-    """
+async def retrieve_similar_abstracts(embedding, k=30):
+    if await has_vector_index(ABSTRACT_VECTOR_INDEX):
+        query = """
+            CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node AS p, score
+            WHERE score > 0.5 AND p.abstract IS NOT NULL AND p.title IS NOT NULL
+            RETURN 'Title: ' + p.title + '\\n\\n' + 'Abstract: ' + p.abstract AS text,
+                   score, p.paper_id AS paper_id, p.abstract_embedding AS embedding
+            ORDER BY score DESC
+        """
+    else:
+        logger.warning(f"Vector index {ABSTRACT_VECTOR_INDEX} is missing, falling back to a full scan")
+        query = """
+            MATCH (p:Paper)
+            WHERE p.abstract IS NOT NULL AND p.title IS NOT NULL
+            WITH DISTINCT p, vector.similarity.cosine(p.abstract_embedding, $embedding) AS score
+            WHERE score > 0.5 
+            ORDER BY score DESC LIMIT $k
+            RETURN 'Title: ' + p.title + '\\n\\n' + 'Abstract: ' + p.abstract AS text, 
+                   score, p.paper_id AS paper_id, p.abstract_embedding AS embedding
+        """
     
-    results, meta = db.cypher_query(
+    results, meta = await adb.cypher_query(
         query, 
-        {'embedding': embedding, 'k': k}
+        {'embedding': embedding, 'k': k, 'index': ABSTRACT_VECTOR_INDEX}
     )
     
     return [
         {
             'text': row[0],
             'score': row[1],
+            'embedding': _vector(row[3]),
             'metadata': {
                 'paper_id': row[2]
             }
         }
         for row in results
-    ]
\ No newline at end of file
+    ]
@@ -7,6 +7,9 @@ from neomodel import config
 import os
 from dataclasses import dataclass
 
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", 50))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 30.0))
+
 @dataclass
 class NeomodelConnectionResult:
     success: bool
@@ -45,12 +48,23 @@ def load_default_kg():
     config = load_config()
     return load_kg(config)
 
-def load_kg(config):
+def driver_config(
+    max_connection_pool_size=NEO4J_MAX_CONNECTION_POOL_SIZE,
+    connection_acquisition_timeout=NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+):
+    return {
+        'max_connection_pool_size': max_connection_pool_size,
+        'connection_acquisition_timeout': connection_acquisition_timeout,
+    }
+
+def load_kg(config, refresh_schema=True):
     kg = Neo4jGraph(
         url=config['database']['uri'], 
         username=config['database']['username'], 
         password=config['database']['password'],
-        database=config['database']['database']
+        database=config['database']['database'],
+        refresh_schema=refresh_schema,
+        driver_config=driver_config(),
     )
     return kg
 
@@ -60,6 +74,21 @@ def load_kg_db():
     uri = config['database']['uri']
     return lambda: GraphDatabase.driver(uri, auth=auth)
 
+def create_kg_driver(
+    config=None,
+    max_connection_pool_size=NEO4J_MAX_CONNECTION_POOL_SIZE,
+    connection_acquisition_timeout=NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+):
+    """Long-lived driver whose connection pool is shared by every session borrowed from it."""
+    if config is None:
+        config = load_config()
+    auth = (config['database']['username'], config['database']['password'])
+    return GraphDatabase.driver(
+        config['database']['uri'],
+        auth=auth,
+        **driver_config(max_connection_pool_size, connection_acquisition_timeout),
+    )
+
 def run_query(kg, cypher, params=None):
     if params is None:
         params = {}
@@ -124,8 +153,10 @@ def initialize(kg):
     with kg.session() as session:
         session.execute_write(init_schema)
 
-def check_connection():
+def check_connection(driver=None):
     try:
+        if driver is not None:
+            return driver.verify_connectivity() is None
         db_loader = load_kg_db()
         with db_loader() as db:
             return db.verify_connectivity() is None
@@ -0,0 +1,117 @@
+"""
+Bulk graph writer.
+Writes relationship and chunk rows with one parameterized UNWIND ... MERGE statement per
+batch instead of looking up and connecting each pair of nodes individually.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from neomodel import adb
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.getenv("GRAPH_WRITE_BATCH_SIZE", 1000))
+
+AUTHORED_QUERY = """
+    UNWIND $rows AS row
+    MATCH (p:Paper {paper_id: row.paper_id})
+    MATCH (a:Author {author_id: row.author_id})
+    MERGE (a)-[:AUTHORED]->(p)
+    RETURN count(*) AS written
+"""
+
+PUBLISHED_IN_QUERY = """
+    UNWIND $rows AS row
+    MATCH (p:Paper {paper_id: row.paper_id})
+    MATCH (j:Journal {name: row.journal_name})
+    MERGE (p)-[:PUBLISHED_IN]->(j)
+    RETURN count(*) AS written
+"""
+
+PUBLISHED_AT_QUERY = """
+    UNWIND $rows AS row
+    MATCH (p:Paper {paper_id: row.paper_id})
+    MATCH (v:PublicationVenue {venue_id: row.venue_id})
+    MERGE (p)-[:PUBLISHED_AT]->(v)
+    RETURN count(*) AS written
+"""
+
+CITES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (citing:Paper {paper_id: row.citing_id})
+    MATCH (cited:Paper {paper_id: row.cited_id})
+    MERGE (citing)-[:CITES]->(cited)
+    RETURN count(*) AS written
+"""
+
+# Chunks are collected in row order, so NEXT edges follow the document order and
+# the first chunk of a batch is linked to the last chunk of the previous batch.
+CHUNK_QUERY = """
+    UNWIND $rows AS row
+    MERGE (c:Chunk {chunkId: row.chunkId})
+    ON CREATE SET c.uid = replace(randomUUID(), '-', '')
+    SET c.paper_id = row.paper_id, c.source = row.source, c.text = row.text, c.textEmbedding = row.textEmbedding
+    WITH c, row
+    OPTIONAL MATCH (p:Paper {paper_id: row.paper_id})
+    FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (c)-[:BELONGS_TO_PAPER]->(p))
+    WITH collect(c) AS chunks
+    OPTIONAL MATCH (prev:Chunk {chunkId: $previous_chunk_id})
+    WITH size(chunks) AS written, CASE WHEN prev IS NULL THEN chunks ELSE [prev] + chunks END AS ordered
+    FOREACH (i IN range(0, size(ordered) - 2) |
+        FOREACH (a IN [ordered[i]] | FOREACH (b IN [ordered[i + 1]] | MERGE (a)-[:NEXT]->(b))))
+    RETURN written
+"""
+
+@dataclass
+class BatchWriteResult:
+    relation: str
+    batch: int
+    rows: int
+    written: int
+
+def batched(rows: Sequence, batch_size: int) -> Iterator[Sequence]:
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+async def write_rows(relation: str, query: str, rows: Sequence[Dict], batch_size: int = DEFAULT_BATCH_SIZE, params: Optional[Dict] = None) -> List[BatchWriteResult]:
+    """Run `query` once per batch of rows, passing the batch as `$rows` alongside any extra `params`."""
+    results = []
+    for i, batch in enumerate(batched(list(rows), batch_size)):
+        try:
+            records, _ = await adb.cypher_query(query, {**(params or {}), "rows": list(batch)})
+            written = records[0][0] if records else 0
+        except Exception as e:
+            logger.error(f"Error writing {relation} batch {i} ({len(batch)} rows): {e}")
+            written = 0
+        logger.info(f"Wrote {written}/{len(batch)} {relation} rows in batch {i}")
+        results.append(BatchWriteResult(relation=relation, batch=i, rows=len(batch), written=written))
+    return results
+
+def _unique_rows(pairs: Iterable[Tuple[str, str]], keys: Tuple[str, str]) -> List[Dict]:
+    return [dict(zip(keys, pair)) for pair in dict.fromkeys(pairs)]
+
+async def write_paper_authors(relations: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE):
+    rows = _unique_rows(relations, ("paper_id", "author_id"))
+    return await write_rows("AUTHORED", AUTHORED_QUERY, rows, batch_size)
+
+async def write_paper_journals(relations: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE):
+    rows = _unique_rows(relations, ("paper_id", "journal_name"))
+    return await write_rows("PUBLISHED_IN", PUBLISHED_IN_QUERY, rows, batch_size)
+
+async def write_paper_venues(relations: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE):
+    rows = _unique_rows(relations, ("paper_id", "venue_id"))
+    return await write_rows("PUBLISHED_AT", PUBLISHED_AT_QUERY, rows, batch_size)
+
+async def write_citations(relations: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE):
+    """Write (citing paper id, cited paper id) pairs as CITES edges."""
+    rows = _unique_rows(relations, ("citing_id", "cited_id"))
+    return await write_rows("CITES", CITES_QUERY, rows, batch_size)
+
+async def write_chunks(rows: Sequence[Dict], previous_chunk_id: Optional[str] = None) -> BatchWriteResult:
+    """Persist one batch of chunks with their BELONGS_TO_PAPER and NEXT edges in a single query."""
+    results = await write_rows("Chunk", CHUNK_QUERY, rows, max(len(rows), 1), params={"previous_chunk_id": previous_chunk_id})
+    return results[0] if results else BatchWriteResult(relation="Chunk", batch=0, rows=0, written=0)
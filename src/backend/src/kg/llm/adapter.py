@@ -2,16 +2,29 @@ from langchain_ollama.llms import OllamaLLM
 from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain_core.language_models.llms import LLM
 from langchain_core.outputs import GenerationChunk
-from typing import Any, AsyncIterator, Iterator, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from kg.llm.embedding_cache import EmbeddingCache, get_embedding_cache
+import asyncio
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+OLLAMA_MAX_CONCURRENT_REQUESTS = int(os.getenv("OLLAMA_MAX_CONCURRENT_REQUESTS", 2))
+
+_model_limits: Dict[str, asyncio.Semaphore] = {}
+
+def model_limit(model_id: str) -> asyncio.Semaphore:
+    """Per-model cap on concurrent generations, shared by every adapter in the process."""
+    if model_id not in _model_limits:
+        _model_limits[model_id] = asyncio.Semaphore(OLLAMA_MAX_CONCURRENT_REQUESTS)
+    return _model_limits[model_id]
 
 class BaseLLM:
     def stream(self, prompt: str):
         raise NotImplementedError("stream() must be implemented by subclasses.")
+    def astream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError("astream() must be implemented by subclasses.")
 
 class LangChainWrapper(LLM):
     adapter: BaseLLM
@@ -43,19 +56,21 @@ class LangChainWrapper(LLM):
     def get_num_tokens(self, text: str) -> int:
         return len(text.split())
 
-    async def _acall(self, prompt: str, **kwargs: Any) -> str:
-        return self._call(prompt, **kwargs)
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        return "".join([token async for token in self.adapter.astream(prompt)])
 
     async def _astream(
         self,
         prompt: str,
+        stop: Optional[List[str]] = None,
         **kwargs: Any,
     ) -> AsyncIterator[GenerationChunk]:
-        for token in self.adapter.stream(prompt):
+        async for token in self.adapter.astream(prompt):
             yield GenerationChunk(text=token)
 
 class OllamaAdapter(BaseLLM):
     def __init__(self, model_id:str="gemma3:1b", num_ctx:int=32768, num_predict:int=4096, temperature:float=0.5):
+        self.model_id = model_id
         self.llm = OllamaLLM(
             model=model_id,
             num_ctx=num_ctx,
@@ -66,6 +81,12 @@ class OllamaAdapter(BaseLLM):
     def stream(self, prompt: str):
         return self.llm.stream(prompt)
 
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream tokens from Ollama's async client, waiting for a free slot for this model."""
+        async with model_limit(self.model_id):
+            async for token in self.llm.astream(prompt):
+                yield token
+
 def get_llm(config):
     provider = config["llm"]["provider"].lower()
     if provider == "ollama":
@@ -80,16 +101,39 @@ def get_llm_with_memory(config):
 class BaseEmbeddings:
     def embed_query(self, text: str):
         raise NotImplementedError("embed_query() must be implemented.")
+    def embed_documents(self, texts: List[str]):
+        return [self.embed_query(text) for text in texts]
     def prepare_query(self, query: str):
         return query
 
 class NomicEmbeddingAdapter(BaseEmbeddings):
-    def __init__(self, model_id):
+    def __init__(self, model_id, cache: Optional[EmbeddingCache] = None):
+        self.model_id = model_id
         self.embeddings = OllamaEmbeddings(model=model_id, base_url=ollama_base_url)
         self.query_prefix = ""
+        self.cache = cache if cache is not None else get_embedding_cache()
 
     def embed_query(self, text: str):
-        return self.embeddings.embed_query(text)
-    
+        if self.cache is None:
+            return self.embeddings.embed_query(text)
+        cached = self.cache.get_many(self.model_id, [text])
+        if text in cached:
+            return cached[text]
+        embedding = self.embeddings.embed_query(text)
+        self.cache.set_many(self.model_id, [(text, embedding)])
+        return embedding
+
+    def embed_documents(self, texts: List[str]):
+        """Embed `texts`, only sending those without a cached vector to the model."""
+        if self.cache is None:
+            return self.embeddings.embed_documents(texts)
+        vectors = self.cache.get_many(self.model_id, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if missing:
+            embedded = list(zip(missing, self.embeddings.embed_documents(missing)))
+            self.cache.set_many(self.model_id, embedded)
+            vectors.update(embedded)
+        return [vectors[text] for text in texts]
+
     def prepare_query(self, query: str):
         return self.query_prefix + query
\ No newline at end of file
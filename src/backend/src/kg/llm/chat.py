@@ -2,11 +2,16 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from rabbit.events import ChatMessage
 from kg.db.queries import retrieve_similar_chunks, retrieve_similar_abstracts
-from kg.llm.conversation import get_session_history
+from kg.llm.memory import get_windowed_session_history
+from kg.llm.context import SEPARATOR, context_budget, pack_context
+from kg.llm.tokens import estimate_message_tokens, estimate_tokens
+from kg.llm.retrieval_cache import embedding_hash, get_query_embedding, retrieval_results, set_query_embedding
 from kg.llm.adapter import OllamaAdapter, LangChainWrapper, NomicEmbeddingAdapter
 
+import asyncio
 import os
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
@@ -33,38 +38,81 @@ Chunks:
     ("human", "{question}")
 ])
 
+RETRIEVAL_K = 30
+
 def retrieve_context_wrapper(emb_adapter):
-    return lambda inputs: retrieve_context(emb_adapter, inputs)
+    async def retrieve(inputs):
+        return await retrieve_context(emb_adapter, inputs)
+    return retrieve
+
+async def timed(timings: dict, stage: str, awaitable):
+    """Await `awaitable`, recording its latency in ms under `stage`."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = (time.perf_counter() - start) * 1000
+
+async def embed_question(emb_adapter, question: str):
+    model_id = getattr(emb_adapter, "model_id", "")
+    embedding = get_query_embedding(model_id, question)
+    if embedding is None:
+        embedding = await asyncio.to_thread(emb_adapter.embed_query, emb_adapter.prepare_query(question))
+        set_query_embedding(model_id, question, embedding)
+    return embedding
+
+async def search(kind: str, retrieve, embedding, k: int = RETRIEVAL_K):
+    key = (kind, embedding_hash(embedding), k)
+    results = retrieval_results.get(key)
+    if results is None:
+        generation = retrieval_results.generation
+        results = await retrieve(embedding, k=k)
+        retrieval_results.set(key, results, generation)
+    return results
 
-def retrieve_context(emb_adapter, inputs):
+async def retrieve_context(emb_adapter, inputs):
     question = inputs["question"]
-    prepared_question = emb_adapter.prepare_query(question)
-    question_embedding = emb_adapter.embeddings.embed_query(prepared_question)
-    chunk_results = retrieve_similar_chunks(question_embedding, k=30)
-    abstract_results = retrieve_similar_abstracts(question_embedding, k=30)
-    context_text = "\n\n---\n\n".join([result['text'] for result in chunk_results])
-    abstract_text = "\n\n---\n\n".join([result['text'] for result in abstract_results])
-    
+    timings = {}
+    start = time.perf_counter()
+    question_embedding = await timed(timings, "embed", embed_question(emb_adapter, question))
+    # The chunk and abstract searches are independent, so they run side by side
+    chunk_results, abstract_results = await asyncio.gather(
+        timed(timings, "chunks", search("chunks", retrieve_similar_chunks, question_embedding)),
+        timed(timings, "abstracts", search("abstracts", retrieve_similar_abstracts, question_embedding)),
+    )
+    prefix = inputs.get("prefix", default_prefix)
+    chat_history = inputs.get("chat_history", [])
+    budget = context_budget(
+        inputs.get("num_ctx"),
+        inputs.get("num_predict"),
+        estimate_tokens(prefix) + estimate_tokens(question) + estimate_message_tokens(chat_history),
+    )
+    abstracts, chunks = pack_context(question_embedding, chunk_results, abstract_results, budget)
+    timings["total"] = (time.perf_counter() - start) * 1000
+    logger.info("Retrieval latency: " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in timings.items()))
+    logger.info(f"Packed {len(chunks)} passages from {len(chunk_results)} chunks and {len(abstracts)} of {len(abstract_results)} abstracts into a budget of {budget} tokens")
+
     return {
-        "prefix": inputs.get("prefix", default_prefix),
-        "abstracts": abstract_text,
-        "chunks": context_text,
+        "prefix": prefix,
+        "abstracts": SEPARATOR.join(abstracts),
+        "chunks": SEPARATOR.join(chunks),
         "question": question,
-        "chat_history": inputs.get("chat_history", [])
+        "chat_history": chat_history,
+        "retrieval_timings": timings,
     }
 
 def create_rag_chain_with_memory(llm_adapter, emb_adapter):
     chain = retrieve_context_wrapper(emb_adapter) | prompt_template_with_history | llm_adapter
     chain_with_history = RunnableWithMessageHistory(
         chain,
-        get_session_history,
+        get_windowed_session_history,
         input_messages_key="question",
         history_messages_key="chat_history",
     )
     
     return chain_with_history
 
-def ask_llm_kg_with_conversation(message: ChatMessage, session_id: str = "default"):
+async def ask_llm_kg_with_conversation(message: ChatMessage, session_id: str = "default"):
     llm_adapter = LangChainWrapper(adapter=OllamaAdapter(
         model_id=message.model,
         num_ctx=message.numCtx,
@@ -74,19 +122,24 @@ def ask_llm_kg_with_conversation(message: ChatMessage, session_id: str = "defaul
 
     nomic_adapter = NomicEmbeddingAdapter(model_id='nomic-embed-text:v1.5')
     conversational_chain = create_rag_chain_with_memory(llm_adapter, nomic_adapter)
-    response = conversational_chain.stream(
-        {"question": message.message, "prefix": message.prefix or default_prefix},
+    response = conversational_chain.astream(
+        {
+            "question": message.message,
+            "prefix": message.prefix or default_prefix,
+            "num_ctx": message.numCtx,
+            "num_predict": message.numPredict,
+        },
         config={"configurable": {"session_id": session_id}}
     )
     
-    for chunk in response:
+    async for chunk in response:
         yield chunk.content if hasattr(chunk, 'content') else str(chunk)
 
 
 async def ask_kg(message: ChatMessage, cb, complete, session_id: str = "default"):
     logger.info(f"Handling chat request: {message}")
     try:
-        for chunk in ask_llm_kg_with_conversation(message, session_id):
+        async for chunk in ask_llm_kg_with_conversation(message, session_id):
             await cb(chunk)
         await complete()
     except Exception as e:
@@ -0,0 +1,148 @@
+"""
+Token-budgeted packing of retrieved context.
+Retrieved chunks that follow each other through NEXT are merged with their shared overlap
+removed, then chunks and abstracts are picked by maximal marginal relevance until the
+prompt's context budget is spent.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from kg.llm.embedding_cache import split_prefix
+from kg.llm.tokens import estimate_tokens
+import numpy as np
+import os
+
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.95))
+CONTEXT_RESERVE_TOKENS = int(os.getenv("CONTEXT_RESERVE_TOKENS", 256))
+# Chunks are split with this much overlap, see kg.llm.embeddings
+CONTEXT_MAX_OVERLAP = int(os.getenv("EMBEDDING_CHUNK_OVERLAP", 100))
+MIN_OVERLAP = 8
+
+SEPARATOR = "\n\n---\n\n"
+SEPARATOR_TOKENS = estimate_tokens(SEPARATOR)
+
+@dataclass
+class Passage:
+    kind: str
+    text: str
+    score: float
+    embedding: Optional[np.ndarray] = None
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+def _unit(vector) -> Optional[np.ndarray]:
+    if vector is None or len(vector) == 0:
+        return None
+    vector = np.asarray(vector, dtype=np.float64)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def join_overlapping(first: str, second: str, max_overlap: int = CONTEXT_MAX_OVERLAP) -> str:
+    """Concatenate neighbouring chunks, dropping the text the splitter repeated at the seam."""
+    for size in range(min(len(first), len(second), max_overlap), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+def merge_adjacent_chunks(chunks: Sequence[dict]) -> List[Passage]:
+    """Merge retrieved chunks linked by NEXT into one passage per run, in retrieval order."""
+    by_id: Dict[str, dict] = {}
+    for chunk in chunks:
+        chunk_id = chunk.get("metadata", {}).get("chunkId")
+        by_id[chunk_id or str(id(chunk))] = chunk
+    successors = {chunk.get("metadata", {}).get("nextChunkId") for chunk in chunks}
+
+    passages = []
+    merged = set()
+    # Runs start at chunks no other retrieved chunk points to, taken in order of relevance
+    heads = [chunk_id for chunk_id in by_id if chunk_id not in successors]
+    for chunk_id in heads + list(by_id):
+        if chunk_id in merged:
+            continue
+        run = []
+        while chunk_id in by_id and chunk_id not in merged:
+            merged.add(chunk_id)
+            run.append(by_id[chunk_id])
+            chunk_id = by_id[chunk_id].get("metadata", {}).get("nextChunkId")
+
+        text = split_prefix(run[0]["text"])[1]
+        for chunk in run[1:]:
+            text = join_overlapping(text, split_prefix(chunk["text"])[1])
+        vectors = [v for v in (_unit(chunk.get("embedding")) for chunk in run) if v is not None]
+        passages.append(Passage(
+            kind="chunk",
+            text=text,
+            score=max(chunk.get("score", 0.0) for chunk in run),
+            embedding=_unit(np.mean(vectors, axis=0)) if vectors else None,
+        ))
+    return passages
+
+def mmr_order(
+    query_embedding: Sequence[float],
+    passages: Sequence[Passage],
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+    duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+) -> List[Passage]:
+    """
+    Order passages by maximal marginal relevance: relevance to the query minus similarity to
+    passages already picked. Passages nearly identical to a picked one are dropped.
+    """
+    if not passages:
+        return []
+    query = _unit(query_embedding)
+    dims = len(query) if query is not None else 0
+    vectors = np.array([
+        p.embedding if p.embedding is not None and len(p.embedding) == dims else np.zeros(dims)
+        for p in passages
+    ])
+    has_vector = vectors.any(axis=1) if dims else np.zeros(len(passages), dtype=bool)
+    # Passages without an embedding fall back to their search score
+    relevance = np.array([p.score for p in passages], dtype=np.float64)
+    if dims:
+        relevance = np.where(has_vector, vectors @ query, relevance)
+
+    redundancy = np.zeros(len(passages))
+    remaining = list(range(len(passages)))
+    ordered = []
+    while remaining:
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+        if redundancy[best] >= duplicate_threshold:
+            continue
+        ordered.append(passages[best])
+        if has_vector[best]:
+            redundancy = np.maximum(redundancy, np.where(has_vector, vectors @ vectors[best], 0.0))
+    return ordered
+
+def context_budget(num_ctx: Optional[int], num_predict: Optional[int], used_tokens: int = 0) -> Optional[int]:
+    """Tokens left for retrieved context once the answer, the rest of the prompt and a margin are set aside."""
+    if not num_ctx:
+        return None
+    return max(num_ctx - (num_predict or 0) - used_tokens - CONTEXT_RESERVE_TOKENS, 0)
+
+def pack_context(
+    query_embedding: Sequence[float],
+    chunks: Sequence[dict],
+    abstracts: Sequence[dict],
+    budget: Optional[int] = None,
+) -> Tuple[List[str], List[str]]:
+    """
+    Pick abstracts and chunk passages in MMR order while they fit `budget` estimated tokens
+    (unbounded when None). Returns the abstract texts and the chunk texts.
+    """
+    passages = merge_adjacent_chunks(chunks) + [
+        Passage(kind="abstract", text=a["text"], score=a.get("score", 0.0), embedding=_unit(a.get("embedding")))
+        for a in abstracts
+    ]
+    packed = {"abstract": [], "chunk": []}
+    used = 0
+    for passage in mmr_order(query_embedding, passages):
+        cost = passage.tokens + SEPARATOR_TOKENS
+        if budget is not None and used + cost > budget:
+            continue
+        packed[passage.kind].append(passage.text)
+        used += cost
+    return packed["abstract"], packed["chunk"]
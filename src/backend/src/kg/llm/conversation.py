@@ -1,57 +1,233 @@
 from langchain_community.chat_message_histories import SQLChatMessageHistory
+from langchain_community.chat_message_histories.sql import DefaultMessageConverter
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from typing import Any, Callable, List, Optional, Sequence
+import asyncio
+import json
+import os
 import shutil
-import sqlite3
+import threading
+import weakref
 
-def clear_conversation_history(session_id: str = "default"):
-    history = SQLChatMessageHistory(
-        session_id=session_id,
-        connection_string="sqlite:////data/chat_conversations.db"
+CHAT_DB_PATH = os.getenv("CHAT_DB_PATH", "/data/chat_conversations.db")
+CHAT_DB_URL = f"sqlite:///{CHAT_DB_PATH}"
+CHAT_DB_POOL_SIZE = int(os.getenv("CHAT_DB_POOL_SIZE", 5))
+CHAT_DB_BUSY_TIMEOUT_MS = int(os.getenv("CHAT_DB_BUSY_TIMEOUT_MS", 5000))
+
+MESSAGE_TABLE = "message_store"
+
+# One row per chat, kept up to date on every write so listing and summarizing chats never
+# scans the message table
+CREATE_SESSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        message_count INTEGER NOT NULL,
+        first_message TEXT,
+        last_message TEXT,
+        last_timestamp TEXT
     )
-    history.clear()
+"""
+
+# Fills the summary table from messages written before it existed
+BACKFILL_SESSIONS = f"""
+    INSERT OR IGNORE INTO chat_sessions (session_id, message_count, first_message, last_message, last_timestamp)
+    SELECT s.session_id, s.message_count,
+        json_extract(f.message, '$.data.content'),
+        json_extract(l.message, '$.data.content'),
+        json_extract(l.message, '$.data.additional_kwargs.timestamp')
+    FROM (
+        SELECT session_id, COUNT(*) AS message_count, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM {MESSAGE_TABLE} GROUP BY session_id
+    ) s
+    JOIN {MESSAGE_TABLE} f ON f.id = s.first_id
+    JOIN {MESSAGE_TABLE} l ON l.id = s.last_id
+"""
+
+UPSERT_SESSION = """
+    INSERT INTO chat_sessions (session_id, message_count, first_message, last_message, last_timestamp)
+    VALUES (:session_id, :message_count, :first_message, :last_message, :last_timestamp)
+    ON CONFLICT(session_id) DO UPDATE SET
+        message_count = message_count + excluded.message_count,
+        last_message = excluded.last_message,
+        last_timestamp = excluded.last_timestamp
+"""
+
+_converter = DefaultMessageConverter(MESSAGE_TABLE)
+_initialized: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+_init_lock = threading.Lock()
+_engine: Optional[Engine] = None
+_restore_listeners: List[Callable[[], None]] = []
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={CHAT_DB_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def create_chat_engine(url: str = CHAT_DB_URL, pool_size: int = CHAT_DB_POOL_SIZE) -> Engine:
+    engine = create_engine(url, pool_size=pool_size, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def get_chat_engine() -> Engine:
+    """Process-wide engine, so every chat history shares one connection pool."""
+    global _engine
+    with _init_lock:
+        if _engine is None:
+            _engine = create_chat_engine(CHAT_DB_URL)
+    return _engine
+
+def init_chat_schema(engine: Engine):
+    """Create the message and chat summary tables and their indexes once per engine."""
+    with _init_lock:
+        if engine in _initialized:
+            return
+        _converter.get_sql_model_class().metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{MESSAGE_TABLE}_session_id ON {MESSAGE_TABLE} (session_id, id)"))
+            created = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_sessions'")).first() is None
+            conn.execute(text(CREATE_SESSIONS_TABLE))
+            if created:
+                conn.execute(text(BACKFILL_SESSIONS))
+        _initialized.add(engine)
+
+def _content_text(content: Any) -> str:
+    return content if isinstance(content, str) else json.dumps(content)
+
+class ChatHistory(SQLChatMessageHistory):
+    """
+    SQLite chat history usable from async chains: the async methods run the synchronous
+    queries in a worker thread instead of requiring an async engine. Writes also keep the
+    chat's row in `chat_sessions` current, in the same transaction as the messages.
+    """
+    def __init__(self, session_id: str, connection_string: Optional[str] = None, connection: Optional[Engine] = None):
+        if connection_string is None and connection is None:
+            connection = get_chat_engine()
+        super().__init__(
+            session_id=session_id,
+            connection_string=connection_string,
+            connection=connection,
+            custom_message_converter=_converter,
+        )
+
+    def _create_table_if_not_exists(self) -> None:
+        init_chat_schema(self.engine)
+        self._table_created = True
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        with self._make_sync_session() as session:
+            for message in messages:
+                session.add(self.converter.to_sql_model(message, self.session_id))
+            session.execute(text(UPSERT_SESSION), {
+                "session_id": self.session_id,
+                "message_count": len(messages),
+                "first_message": _content_text(messages[0].content),
+                "last_message": _content_text(messages[-1].content),
+                "last_timestamp": messages[-1].additional_kwargs.get("timestamp"),
+            })
+            session.commit()
+
+    def message_count(self) -> int:
+        with self._make_sync_session() as session:
+            row = session.execute(
+                text("SELECT message_count FROM chat_sessions WHERE session_id = :session_id"), {"session_id": self.session_id}
+            ).first()
+        return row[0] if row else 0
+
+    def get_messages(self, start: int = 0, stop: Optional[int] = None) -> List[BaseMessage]:
+        """Messages `start` to `stop` in insertion order, read through the (session_id, id) index."""
+        model = self.sql_model_class
+        with self._make_sync_session() as session:
+            query = session.query(model).filter(model.session_id == self.session_id).order_by(model.id).offset(start)
+            if stop is not None:
+                query = query.limit(max(stop - start, 0))
+            return [self.converter.from_sql_model(record) for record in query]
+
+    def clear(self) -> None:
+        with self._make_sync_session() as session:
+            session.query(self.sql_model_class).filter(self.sql_model_class.session_id == self.session_id).delete()
+            session.execute(text("DELETE FROM chat_sessions WHERE session_id = :session_id"), {"session_id": self.session_id})
+            session.commit()
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return await asyncio.to_thread(lambda: self.messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await asyncio.to_thread(self.add_messages, messages)
+
+    async def aclear(self) -> None:
+        await asyncio.to_thread(self.clear)
+
+def clear_conversation_history(session_id: str = "default"):
+    get_session_history(session_id).clear()
 
 def get_conversation_history(session_id: str):
-    history = SQLChatMessageHistory(
-        session_id=session_id,
-        connection_string="sqlite:////data/chat_conversations.db"
-    )
-    return history.messages
-
-def list_all_sessions():
-    conn = sqlite3.connect("/data/chat_conversations.db")
-    cursor = conn.cursor()
-    
-    # Get all unique session IDs
-    cursor.execute("SELECT DISTINCT session_id FROM message_store")
-    sessions = [row[0] for row in cursor.fetchall()]
-    
-    conn.close()
-    return sessions
+    return get_session_history(session_id).messages
+
+def list_all_sessions(engine: Optional[Engine] = None):
+    engine = engine or get_chat_engine()
+    init_chat_schema(engine)
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT session_id FROM chat_sessions"))]
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    return SQLChatMessageHistory(
-        session_id=session_id,
-        connection_string="sqlite:////data/chat_conversations.db"
-    )
+    return ChatHistory(session_id=session_id)
 
-def get_session_summary(session_id: str):
-    history = get_conversation_history(session_id)
-    if not history:
+def get_session_summary(session_id: str, engine: Optional[Engine] = None):
+    engine = engine or get_chat_engine()
+    init_chat_schema(engine)
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT message_count, first_message, last_message, last_timestamp FROM chat_sessions WHERE session_id = :session_id"),
+            {"session_id": session_id},
+        ).first()
+    if row is None or not row.message_count:
         return {"session_id": session_id, "message_count": 0, "last_message": None}
-    
+
     return {
         "session_id": session_id,
-        "message_count": len(history),
-        "first_message": history[0].content if history else None,
-        "last_message": history[-1].content if history else None,
-        "last_timestamp": history[-1].additional_kwargs.get('timestamp') if history else None
+        "message_count": row.message_count,
+        "first_message": row.first_message,
+        "last_message": row.last_message,
+        "last_timestamp": row.last_timestamp
     }
 
-def restore_conversation_from_backup(backup_file: str, target_db: str = "/data/chat_conversations.db"):
+def on_restore(listener: Callable[[], None]):
+    """Register a callback that closes other connections to the chat database before a restore."""
+    _restore_listeners.append(listener)
+
+def restore_conversation_from_backup(backup_file: str, target_db: str = CHAT_DB_PATH):
+    engine = get_chat_engine()
+    if os.path.realpath(target_db) != os.path.realpath(engine.url.database):
+        raise ValueError(f"{target_db} is not the chat database {engine.url.database}")
+    # Every connection has to be closed before the copy: the last one to close checkpoints
+    # the WAL into the main file, which would overwrite the restored pages
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+    for listener in _restore_listeners:
+        listener()
     shutil.copy2(backup_file, target_db)
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.remove(target_db + suffix)
+        except FileNotFoundError:
+            pass
+    # The backup may predate the chat_sessions table
+    with _init_lock:
+        _initialized.discard(engine)
     print(f"Conversations restored from {backup_file}")
 
 def backup_conversations(backup_file: str = "/data/chat_backup.db"):
-    import shutil
-    shutil.copy2("/data/chat_conversations.db", backup_file)
-    print(f"Conversations backed up to {backup_file}")
\ No newline at end of file
+    engine = get_chat_engine()
+    # Fold the WAL into the main file so the copy holds every committed message
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    shutil.copy2(engine.url.database, backup_file)
+    print(f"Conversations backed up to {backup_file}")
@@ -0,0 +1,157 @@
+"""
+Persistent embedding cache.
+Stores vectors as packed float32 (or float16) blobs in SQLite keyed by model, task prefix and the
+SHA-256 of the text, evicting least recently used vectors once the file exceeds its byte budget.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import logging
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "/data/embedding_cache.db")
+EMBEDDING_CACHE_MAX_BYTES = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+# Nomic task prefixes are part of the embedded text but kept as a separate key component
+TASK_PREFIXES = ("search_query: ", "search_document: ", "clustering: ", "classification: ")
+
+def split_prefix(text: str) -> Tuple[str, str]:
+    for prefix in TASK_PREFIXES:
+        if text.startswith(prefix):
+            return prefix, text[len(prefix):]
+    return "", text
+
+def text_key(text: str) -> Tuple[str, str]:
+    prefix, body = split_prefix(text)
+    return prefix, hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES, dtype: str = EMBEDDING_CACHE_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_id TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (model_id, prefix, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_accessed_at ON embeddings (accessed_at)")
+        self._bytes = self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_id: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for whichever of `texts` have been embedded with `model_id`."""
+        keys = {text: text_key(text) for text in dict.fromkeys(texts)}
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            for text, (prefix, digest) in keys.items():
+                row = self._conn.execute(
+                    "SELECT dtype, vector FROM embeddings WHERE model_id = ? AND prefix = ? AND text_hash = ?",
+                    (model_id, prefix, digest),
+                ).fetchone()
+                if row is not None:
+                    found[text] = np.frombuffer(row[1], dtype=row[0]).astype(np.float64).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE model_id = ? AND prefix = ? AND text_hash = ?",
+                    [(now, model_id, *keys[text]) for text in found],
+                )
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, model_id: str, items: Iterable[Tuple[str, Sequence[float]]]):
+        now = time.time()
+        rows = []
+        for text, vector in items:
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((model_id, *text_key(text), self.dtype.name, blob, now))
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                # The same key always maps to the same vector, so existing rows are left alone
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (model_id, prefix, text_hash, dtype, vector, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                if cursor.rowcount:
+                    self._bytes += len(row[4])
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used vectors until the cache fits its byte budget."""
+        with self._lock:
+            self._bytes = self._total_bytes()
+            excess = self._bytes - self.max_bytes
+            if excess <= 0:
+                return
+            freed = 0
+            stale = []
+            for rowid, size in self._conn.execute("SELECT rowid, length(vector) FROM embeddings ORDER BY accessed_at"):
+                stale.append((rowid,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", stale)
+            self._bytes -= freed
+            logger.info(f"Evicted {len(stale)} cached embeddings ({freed} bytes)")
+
+    def size(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[EmbeddingCache] = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache, or None when caching is disabled or the cache file cannot be opened."""
+    global _cache, _cache_failed
+    # Adapters are created from worker threads, so guard against opening the file twice
+    with _cache_lock:
+        if _cache is None and not _cache_failed:
+            if not EMBEDDING_CACHE_PATH:
+                _cache_failed = True
+                return None
+            try:
+                _cache = EmbeddingCache()
+            except Exception as e:
+                logger.warning(f"Embedding cache disabled, unable to open {EMBEDDING_CACHE_PATH}: {e}")
+                _cache_failed = True
+    return _cache
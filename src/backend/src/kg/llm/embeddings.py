@@ -1,7 +1,8 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from rabbit.events import DocumentGraphUpdated
 from kg.llm.chat import NomicEmbeddingAdapter
-from kg.db.models import Paper, Chunk
+from kg.db.writer import batched, write_chunks
+import asyncio
 import re
 import logging
 import os
@@ -10,6 +11,8 @@ logger = logging.getLogger(__name__)
 DEFAULT_CHUNK_SIZE = int(os.getenv("EMBEDDING_CHUNK_SIZE", 500))
 DEFAULT_CHUNK_OVERLAP = int(os.getenv("EMBEDDING_CHUNK_OVERLAP", 100))
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text:v1.5")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+ABSTRACT_EMBEDDING_BATCH_SIZE = int(os.getenv("ABSTRACT_EMBEDDING_BATCH_SIZE", 64))
 
 
 def paper_data_from_file(md_text, paper_id, text_splitter):
@@ -30,55 +33,86 @@ def remove_references_section(text):
     return split_result[0] if split_result else text
 
 
-async def create_chunk_nodes_with_embeddings(md_text, paper_id, text_splitter, model_id=EMBEDDING_MODEL):
-    node_count = 0
-    nomic_adapter = NomicEmbeddingAdapter(model_id=model_id)
-    chunks = paper_data_from_file(md_text, paper_id, text_splitter)
-    previous_chunk_node = None
-    
-    # Get the paper node
-    paper_node = await Paper.nodes.get_or_none(paper_id=paper_id)
-    
-    logger.info(f"Creating chunk nodes for paperId: {paper_id}, total chunks: {len(chunks)}")
+def embed_chunk_batch(nomic_adapter, chunks):
+    """Embed a batch of chunks in one request, falling back to one request per chunk on failure."""
+    try:
+        embeddings = nomic_adapter.embed_documents([chunk['text'] for chunk in chunks])
+        return list(zip(chunks, embeddings))
+    except Exception as e:
+        logger.warning(f"Batch embedding failed for {len(chunks)} chunks, embedding individually: {e}")
+
+    embedded = []
     for chunk in chunks:
         try:
-            embedding = nomic_adapter.embed_query(chunk['text'])
+            embedded.append((chunk, nomic_adapter.embed_query(chunk['text'])))
         except Exception as e:
             logger.error(f"Error creating chunk node for chunkId: {chunk['chunkId']}: {e}")
             logger.error(f"Chunk text: {chunk['text'][:-10]}...")
             logger.error("The DEFAULT_CHUNK_SIZE is likely too large for the embedding model.")
-            continue    
+    return embedded
+
+async def create_chunk_nodes_with_embeddings(md_text, paper_id, text_splitter, model_id=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE):
+    node_count = 0
+    nomic_adapter = NomicEmbeddingAdapter(model_id=model_id)
+    chunks = paper_data_from_file(md_text, paper_id, text_splitter)
+    batches = list(batched(chunks, batch_size))
+    previous_chunk_id = None
 
-        if embedding is None:
-            logger.error(f"Embedding is None for chunkId: {chunk['chunkId']}")
+    logger.info(f"Creating chunk nodes for paperId: {paper_id}, total chunks: {len(chunks)}, batches: {len(batches)}")
+    if not batches:
+        return node_count
+
+    # Embed batch N+1 in a worker thread while batch N is written to Neo4j
+    pending = asyncio.create_task(asyncio.to_thread(embed_chunk_batch, nomic_adapter, batches[0]))
+    for i in range(len(batches)):
+        embedded = await pending
+        if i + 1 < len(batches):
+            pending = asyncio.create_task(asyncio.to_thread(embed_chunk_batch, nomic_adapter, batches[i + 1]))
+
+        rows = []
+        for chunk, embedding in embedded:
+            if embedding is None:
+                logger.error(f"Embedding is None for chunkId: {chunk['chunkId']}")
+                continue
+            rows.append({
+                'chunkId': chunk['chunkId'],
+                'paper_id': chunk['paper_id'],
+                'source': chunk['paper_id'],
+                'text': chunk['text'],
+                'textEmbedding': embedding,
+            })
+        if not rows:
             continue
-        
-        # Create or get chunk using neomodel
-        chunk_node = await Chunk(
-            chunkId=chunk['chunkId'],
-            paper_id=chunk['paper_id'],
-            source=chunk['paper_id'],
-            text=chunk['text'],
-            textEmbedding=embedding
-        ).save()
-        
-        # Connect to paper
-        if paper_node is not None:
-            await chunk_node.paper.connect(paper_node)
-        
-        # Link to previous chunk
-        if previous_chunk_node is not None:
-            await previous_chunk_node.next_chunk.connect(chunk_node)
-        
-        previous_chunk_node = chunk_node
-        node_count += 1
-    
+
+        result = await write_chunks(rows, previous_chunk_id)
+        previous_chunk_id = rows[-1]['chunkId']
+        node_count += result.written
+
     return node_count
 
-def create_abstract_embedding(abstract: str, model_id='nomic-embed-text:v1.5'):
+def embed_text_batch(nomic_adapter, texts):
+    """Embed a batch of texts in one request, falling back to one request per text; None where embedding failed."""
+    try:
+        return nomic_adapter.embed_documents(texts)
+    except Exception as e:
+        logger.warning(f"Batch embedding failed for {len(texts)} texts, embedding individually: {e}")
+
+    embeddings = []
+    for text in texts:
+        try:
+            embeddings.append(nomic_adapter.embed_query(text))
+        except Exception as e:
+            logger.error(f"Error creating embedding for text: {text[:50]}...: {e}")
+            embeddings.append(None)
+    return embeddings
+
+async def create_abstract_embeddings(abstracts, model_id=EMBEDDING_MODEL, batch_size=ABSTRACT_EMBEDDING_BATCH_SIZE):
+    """Embed abstracts in batches through a single adapter, returning embeddings in input order."""
     nomic_adapter = NomicEmbeddingAdapter(model_id=model_id)
-    embedding = nomic_adapter.embed_query(abstract)
-    return embedding
+    embeddings = []
+    for batch in batched(list(abstracts), batch_size):
+        embeddings.extend(await asyncio.to_thread(embed_text_batch, nomic_adapter, list(batch)))
+    return embeddings
 
 
 async def create_document_embeddings(update: DocumentGraphUpdated):
@@ -0,0 +1,211 @@
+"""
+Bounded conversation memory.
+The full history stays in the chat store, but prompts only see the last few turns verbatim
+plus a rolling summary of everything older, trimmed to a token budget. Summaries are updated
+incrementally in the background after each turn and cached per chat.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_ollama.llms import OllamaLLM
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from kg.llm.conversation import CHAT_DB_PATH, ChatHistory, get_session_history, on_restore
+from kg.llm.tokens import estimate_message_tokens, estimate_tokens
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 4096))
+CHAT_HISTORY_WINDOW_TURNS = int(os.getenv("CHAT_HISTORY_WINDOW_TURNS", 4))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gemma3:1b")
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", 512))
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a user and a research assistant, adding the new lines to the current summary.
+Keep the papers, findings and open questions discussed. Return only the new summary.
+
+Current summary:
+{summary}
+
+New lines:
+{lines}
+
+New summary:"""
+
+Summarizer = Callable[[str, Sequence[BaseMessage]], str]
+
+def format_lines(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+def ollama_summarizer(model_id: str = CHAT_SUMMARY_MODEL, max_tokens: int = CHAT_SUMMARY_MAX_TOKENS) -> Summarizer:
+    llm = OllamaLLM(model=model_id, num_predict=max_tokens, temperature=0, base_url=ollama_base_url)
+
+    def summarize(summary: str, messages: Sequence[BaseMessage]) -> str:
+        return llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(none)", lines=format_lines(messages))).strip()
+
+    return summarize
+
+class SummaryStore:
+    """Rolling summaries per chat, kept in memory and persisted next to the chat history."""
+    def __init__(self, path: str = CHAT_DB_PATH):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, str]] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_summaries (
+                session_id TEXT PRIMARY KEY,
+                summarized_count INTEGER NOT NULL,
+                summary TEXT NOT NULL
+            )
+        """)
+
+    def get(self, session_id: str) -> Tuple[int, str]:
+        """(number of messages covered, summary) for the chat, (0, "") when nothing is summarized."""
+        with self._lock:
+            if session_id not in self._cache:
+                row = self._conn.execute(
+                    "SELECT summarized_count, summary FROM chat_summaries WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                self._cache[session_id] = (row[0], row[1]) if row else (0, "")
+            return self._cache[session_id]
+
+    def set(self, session_id: str, summarized_count: int, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_summaries (session_id, summarized_count, summary) VALUES (?, ?, ?)",
+                (session_id, summarized_count, summary),
+            )
+            self._cache[session_id] = (summarized_count, summary)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_summaries WHERE session_id = ?", (session_id,))
+            self._cache.pop(session_id, None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# One summarization at a time keeps summaries of a chat in order and the model load bounded
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_summary_store: Optional[SummaryStore] = None
+_summarizer: Optional[Summarizer] = None
+
+def get_summary_store() -> SummaryStore:
+    global _summary_store
+    if _summary_store is None:
+        _summary_store = SummaryStore()
+    return _summary_store
+
+def _release_summary_store():
+    global _summary_store
+    if _summary_store is not None:
+        _summary_store.close()
+        _summary_store = None
+
+# The store keeps its own connection to the chat database, which a restore replaces
+on_restore(_release_summary_store)
+
+def get_summarizer() -> Summarizer:
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ollama_summarizer()
+    return _summarizer
+
+def _message_count(store: BaseChatMessageHistory) -> int:
+    if isinstance(store, ChatHistory):
+        return store.message_count()
+    return len(store.messages)
+
+def _messages_between(store: BaseChatMessageHistory, start: int, stop: int) -> List[BaseMessage]:
+    # The SQL store reads just these rows, so a turn costs the same however long the chat is
+    if isinstance(store, ChatHistory):
+        return store.get_messages(start, stop)
+    return list(store.messages[start:stop])
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """
+    Chat history exposing a rolling summary plus the last `window_turns` turns, trimmed to
+    `token_budget` estimated tokens. Writes go to the underlying store unchanged.
+    """
+    def __init__(
+        self,
+        session_id: str,
+        store: BaseChatMessageHistory,
+        summaries: SummaryStore,
+        summarizer: Optional[Summarizer] = None,
+        window_turns: int = CHAT_HISTORY_WINDOW_TURNS,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+        executor: Optional[ThreadPoolExecutor] = _summary_executor,
+    ):
+        self.session_id = session_id
+        self.store = store
+        self.summaries = summaries
+        self.summarizer = summarizer
+        self.window_messages = max(window_turns, 1) * 2
+        self.token_budget = token_budget
+        self.executor = executor
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        total = _message_count(self.store)
+        summarized_count, summary = self.summaries.get(self.session_id)
+        cutoff = max(total - self.window_messages, 0)
+        # Messages aged out of the window but not summarized yet are kept verbatim until the
+        # background summary catches up
+        start = cutoff if self.summarizer is None else min(summarized_count, cutoff)
+        recent = _messages_between(self.store, start, total)
+
+        prefix = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] if summary else []
+        budget = self.token_budget - estimate_message_tokens(prefix)
+        while len(recent) > 2 and estimate_message_tokens(recent) > budget:
+            recent.pop(0)
+        return prefix + recent
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.add_messages(messages)
+        if self.summarizer is None:
+            return
+        if self.executor is None:
+            self.update_summary()
+        else:
+            self.executor.submit(self.update_summary)
+
+    def update_summary(self):
+        """Fold messages that have left the window into the chat's rolling summary."""
+        try:
+            summarized_count, summary = self.summaries.get(self.session_id)
+            cutoff = max(_message_count(self.store) - self.window_messages, 0)
+            if cutoff <= summarized_count:
+                return
+            summary = self.summarizer(summary, _messages_between(self.store, summarized_count, cutoff))
+            self.summaries.set(self.session_id, cutoff, summary)
+            logger.info(f"Summarized {cutoff} messages of chat {self.session_id} into {estimate_tokens(summary)} tokens")
+        except Exception as e:
+            logger.error(f"Error summarizing chat {self.session_id}: {e}")
+
+    def clear(self) -> None:
+        self.store.clear()
+        self.summaries.delete(self.session_id)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return await asyncio.to_thread(lambda: self.messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await asyncio.to_thread(self.add_messages, messages)
+
+    async def aclear(self) -> None:
+        await asyncio.to_thread(self.clear)
+
+def get_windowed_session_history(session_id: str) -> BaseChatMessageHistory:
+    return WindowedChatHistory(
+        session_id,
+        get_session_history(session_id),
+        get_summary_store(),
+        get_summarizer(),
+    )
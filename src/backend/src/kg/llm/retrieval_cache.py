@@ -0,0 +1,79 @@
+"""
+In-process caches for chat retrieval.
+Question embeddings are kept in an LRU keyed by model and normalized question text. Vector
+search results are kept for a short TTL keyed by a hash of the query embedding and k, and are
+dropped whenever the graph changes.
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+import hashlib
+import numpy as np
+import os
+import threading
+import time
+
+CHAT_QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("CHAT_QUERY_EMBEDDING_CACHE_SIZE", 1024))
+CHAT_RETRIEVAL_CACHE_SIZE = int(os.getenv("CHAT_RETRIEVAL_CACHE_SIZE", 256))
+CHAT_RETRIEVAL_CACHE_TTL = float(os.getenv("CHAT_RETRIEVAL_CACHE_TTL", 300))
+
+def normalize_question(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def embedding_hash(embedding: Sequence[float]) -> str:
+    return hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+class LRUCache:
+    """Thread-safe LRU mapping with optional expiry, bounded to `max_size` entries."""
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped by `clear`, so results computed before an invalidation are not stored after it
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        with self._lock:
+            if self.max_size <= 0 or (generation is not None and generation != self.generation):
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+query_embeddings = LRUCache(CHAT_QUERY_EMBEDDING_CACHE_SIZE)
+retrieval_results = LRUCache(CHAT_RETRIEVAL_CACHE_SIZE, ttl=CHAT_RETRIEVAL_CACHE_TTL)
+
+def get_query_embedding(model_id: str, question: str) -> Optional[List[float]]:
+    return query_embeddings.get((model_id, normalize_question(question)))
+
+def set_query_embedding(model_id: str, question: str, embedding: List[float]):
+    query_embeddings.set((model_id, normalize_question(question)), embedding)
+
+def invalidate_retrieval_cache():
+    """Forget cached search results; question embeddings do not depend on the graph and are kept."""
+    retrieval_results.clear()
@@ -0,0 +1,76 @@
+"""
+Coalescing of streamed LLM tokens.
+Buffers tokens and hands them on as one string once the buffer is older than the flush
+window or larger than the byte threshold, whichever comes first.
+"""
+
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CHAT_STREAM_FLUSH_INTERVAL = float(os.getenv("CHAT_STREAM_FLUSH_MS", 50)) / 1000
+CHAT_STREAM_FLUSH_BYTES = int(os.getenv("CHAT_STREAM_FLUSH_BYTES", 512))
+
+class TokenCoalescer:
+    """
+    Collect tokens and pass them to `flush` in order, at most `interval` seconds after the first
+    buffered token or as soon as `max_bytes` are buffered. Call `close` to flush the remainder.
+    """
+    def __init__(
+        self,
+        flush: Callable[[str], Awaitable[None]],
+        interval: float = CHAT_STREAM_FLUSH_INTERVAL,
+        max_bytes: int = CHAT_STREAM_FLUSH_BYTES,
+    ):
+        self._flush = flush
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.flushes = 0
+        self._buffer: List[str] = []
+        self._size = 0
+        self._started_at: Optional[float] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, token: str):
+        if not token:
+            return
+        self._buffer.append(token)
+        self._size += len(token.encode("utf-8"))
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        # Checked inline as well as by the timer, since a producer that blocks the event loop
+        # between tokens keeps the timer from running
+        if self._size >= self.max_bytes or time.monotonic() - self._started_at >= self.interval:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing streamed tokens: {e}")
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            self._started_at = None
+            self.flushes += 1
+            await self._flush(text)
+
+    async def close(self):
+        await self.flush()
@@ -0,0 +1,18 @@
+"""
+Cheap token estimates for prompt budgeting.
+Ollama does not expose the model's tokenizer, so budgets use the common rule of thumb of
+roughly four characters per token.
+"""
+
+from typing import Iterable
+from langchain_core.messages import BaseMessage
+
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def estimate_message_tokens(messages: Iterable[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(message.content)) for message in messages)
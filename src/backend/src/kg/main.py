@@ -3,19 +3,23 @@ import logging
 from kg.llm.chat import ask_llm_kg_with_conversation
 from kg.llm.visualization import create_plot
 from kg.llm.embeddings import create_document_embeddings
-from rabbit import publish_message, subscribe_to_queue, ChannelType
+from kg.llm.streaming import TokenCoalescer
+from kg.llm.retrieval_cache import invalidate_retrieval_cache
+from rabbit import publish_message, subscribe_to_queue, channel_concurrency, run_blocking, ChannelType
 from kg.db.util import load_kg_db
 from kg.db.commands import clear_graph
 from kg.db.builder import create_paper_graph, add_citations, add_references
+from kg.db.crawler import crawl_paper_graph
 from kg.db.util import neomodel_connect
-from kg.db.chat import create_chat_message, update_chat_response
+from kg.db.chat import create_chat_message, ChatResponseWriter
 from kg.db.docs import add_document_refs
+from kg.db.queries import ensure_vector_indexes
 from scholar.api import search_papers_by_title
 from rabbit.commands import (
-    AddPaperCitations, AddPaperReferences,  AddPapersById, ClearGraph, AddPapersByTitle, CreateEmbeddingPlot
+    AddPaperCitations, AddPaperReferences,  AddPapersById, ClearGraph, AddPapersByTitle, CreateEmbeddingPlot, CrawlPaperGraph
 )
 from rabbit.events import (
-    DocumentGraphUpdated, GraphUpdated, ChatMessage, ChatResponse, DocumentsCreated, EmbeddingPlotCreated, ResponseCompleted
+    DocumentEmbedded, DocumentGraphUpdated, GraphUpdated, ChatMessage, ChatResponse, DocumentsCreated, EmbeddingPlotCreated, ResponseCompleted
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +31,7 @@ async def handle_documents_created(docs: DocumentsCreated):
     for result, new_doc in zip(saved_docs, docs.documents):
         if result.success:
             await publish_message(ChannelType.DOCUMENT_GRAPH_UPDATED, DocumentGraphUpdated(doc=new_doc))
-            await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=[]))
+            await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=[new_doc.id]))
         logger.error(result.message)
 
 async def handle_add_papers(message: AddPapersById):
@@ -40,7 +44,7 @@ async def handle_add_papers_by_title(message: AddPapersByTitle):
     # Query API for papers
     papers = []
     for paper in message.papers:
-        res = search_papers_by_title(paper.title, paper.year)
+        res = await search_papers_by_title(paper.title, paper.year)
         if res:
             papers.append(res)
 
@@ -51,25 +55,41 @@ async def handle_add_papers_by_title(message: AddPapersByTitle):
 
 async def handle_add_references(message: AddPaperReferences):
     logger.info(f"Received add references request: {message}")
-    references = await add_references(message.paper_ids)
+    references = await add_references(message.paper_ids, message.limit)
     await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=references))
 
 async def handle_add_citations(message: AddPaperCitations):
     logger.info(f"Received add citations request: {message}")
-    citations = await add_citations(message.paper_ids)
+    citations = await add_citations(message.paper_ids, message.limit)
     await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=citations))
 
-async def handle_clear_graph(message: ClearGraph):
+async def handle_crawl_papers(message: CrawlPaperGraph):
+    logger.info(f"Received crawl request: {message}")
+
+    async def publish_level(paper_ids):
+        if paper_ids:
+            await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=paper_ids))
+
+    papers = await crawl_paper_graph(
+        message.paper_ids,
+        depth=message.depth,
+        direction=message.direction,
+        fan_out=message.fan_out,
+        min_citation_count=message.min_citation_count,
+        on_level=publish_level,
+    )
+    logger.info(f"Crawl from {message.paper_ids} visited {len(papers)} papers")
+
+def clear_kg():
     loader = load_kg_db()
     with loader() as db:
         clear_graph(db)
+
+async def handle_clear_graph(message: ClearGraph):
+    await run_blocking(clear_kg)
     await publish_message(ChannelType.GRAPH_UPDATED, GraphUpdated(nodeIds=[]))
     logger.info("Graph cleared.")
 
-async def handle_chat_response(message: ChatResponse):
-    await update_chat_response(message)
-    await publish_message(ChannelType.CHAT_RESPONSE_CREATED, message)
-
 async def handle_chat_message(message: ChatMessage):
     logger.info(f"Database received chat message: {message}")
     await create_chat_message(message)
@@ -80,7 +100,7 @@ async def ask_kg(message: ChatMessage, cb, complete):
     logger.info(f"Handling chat request: {message}")
     logger.info(f"Message ID: {message.messageId}")
     try:
-        for chunk in ask_llm_kg_with_conversation(message, message.chatId):
+        async for chunk in ask_llm_kg_with_conversation(message, message.chatId):
             await cb(chunk)
         await complete()
     except Exception as e:
@@ -90,18 +110,39 @@ async def ask_kg(message: ChatMessage, cb, complete):
 
 async def handle_plot_request(message: CreateEmbeddingPlot):
     logger.info(f"Received plot request: {message}")
-    embeddings, labels, paper_ids = create_plot(message.model_id, message.queries, message.color_var, message.labels, message.num_docs, message.num_components)
+    embeddings, labels, paper_ids = await run_blocking(
+        create_plot, message.model_id, message.queries, message.color_var, message.labels, message.num_docs, message.num_components
+    )
     plot_evt = EmbeddingPlotCreated.from_numpy(embeddings, labels, paper_ids)
     await publish_message(ChannelType.EMBEDDING_PLOT_CREATED, plot_evt)
 
+async def handle_graph_changed(message: GraphUpdated | DocumentEmbedded):
+    # Every replica caches its own chat retrievals, so each one listens for graph changes
+    invalidate_retrieval_cache()
+
+async def handle_document_graph_updated(message: DocumentGraphUpdated):
+    await create_document_embeddings(message)
+    # The document's chunks only become searchable once they are embedded, so tell every
+    # replica again to drop retrievals cached while embedding ran
+    await publish_message(ChannelType.DOCUMENT_EMBEDDED, DocumentEmbedded(docId=message.doc.id))
+
 def callbacks(message: ChatMessage):
     first_response = ChatResponse(message="", chatId=message.chatId, userMessageId=message.messageId)
     make_response = lambda msg: ChatResponse(message=msg, chatId=message.chatId, userMessageId=message.messageId, responseId=first_response.responseId)
-    async def async_chat_callback(msg: str):
-        await publish_message(ChannelType.CHAT_RESPONSE, make_response(msg))
+    # The replica generating the answer persists it itself: it is the only one that sees the
+    # tokens in order, and it appends to Neo4j periodically instead of on every fragment
+    writer = ChatResponseWriter(first_response.responseId, message.messageId)
+    async def publish_response(msg: str):
+        await writer.append(msg)
+        await publish_message(ChannelType.CHAT_RESPONSE_CREATED, make_response(msg))
+    # Tokens are batched so each flush, not each token, costs a broadcast
+    coalescer = TokenCoalescer(publish_response)
     async def async_completion_callback():
+        await coalescer.close()
+        await writer.close()
+        logger.info(f"Response {first_response.responseId} streamed in {coalescer.flushes} messages, persisted in {writer.writes} writes")
         await publish_message(ChannelType.RESPONSE_COMPLETED, ResponseCompleted(chatId = message.chatId, responseId = first_response.responseId))
-    return (async_chat_callback, async_completion_callback)
+    return (coalescer.add, async_completion_callback)
 
 async def handle_chat_message_created(message: ChatMessage):
     response_callback, completion_callback = callbacks(message)
@@ -116,19 +157,25 @@ async def main():
         logger.error(result.message)
         exit(1)
 
+    logger.info("Ensuring vector indexes...")
+    indexes = await ensure_vector_indexes()
+    logger.info(f"Online vector indexes: {indexes}")
+
     logger.info("Subscribing to RabbitMQ events...")
     await asyncio.gather(
-        subscribe_to_queue(ChannelType.ADD_PAPER, handle_add_papers, AddPapersById),
-        subscribe_to_queue(ChannelType.ADD_PAPER_BY_TITLE, handle_add_papers_by_title, AddPapersByTitle),
-        subscribe_to_queue(ChannelType.ADD_CITATIONS, handle_add_citations, AddPaperCitations),
-        subscribe_to_queue(ChannelType.ADD_REFERENCES, handle_add_references, AddPaperReferences),
+        subscribe_to_queue(ChannelType.ADD_PAPER, handle_add_papers, AddPapersById, concurrency=channel_concurrency(ChannelType.ADD_PAPER, 2)),
+        subscribe_to_queue(ChannelType.ADD_PAPER_BY_TITLE, handle_add_papers_by_title, AddPapersByTitle, concurrency=channel_concurrency(ChannelType.ADD_PAPER_BY_TITLE, 2)),
+        subscribe_to_queue(ChannelType.ADD_CITATIONS, handle_add_citations, AddPaperCitations, concurrency=channel_concurrency(ChannelType.ADD_CITATIONS, 4)),
+        subscribe_to_queue(ChannelType.ADD_REFERENCES, handle_add_references, AddPaperReferences, concurrency=channel_concurrency(ChannelType.ADD_REFERENCES, 4)),
+        subscribe_to_queue(ChannelType.CRAWL_PAPERS, handle_crawl_papers, CrawlPaperGraph, concurrency=channel_concurrency(ChannelType.CRAWL_PAPERS, 2)),
         subscribe_to_queue(ChannelType.CHAT_MESSAGE, handle_chat_message, ChatMessage),
-        subscribe_to_queue(ChannelType.CHAT_RESPONSE, handle_chat_response, ChatResponse),
-        subscribe_to_queue(ChannelType.CHAT_MESSAGE_CREATED, handle_chat_message_created, ChatMessage),
+        subscribe_to_queue(ChannelType.CHAT_MESSAGE_CREATED, handle_chat_message_created, ChatMessage, concurrency=channel_concurrency(ChannelType.CHAT_MESSAGE_CREATED, 4)),
         subscribe_to_queue(ChannelType.DOCUMENTS_CREATED, handle_documents_created, DocumentsCreated),
-        subscribe_to_queue(ChannelType.DOCUMENT_GRAPH_UPDATED, create_document_embeddings, DocumentGraphUpdated),
-        subscribe_to_queue(ChannelType.EMBEDDING_PLOT_REQUESTED, handle_plot_request, CreateEmbeddingPlot),
-        subscribe_to_queue(ChannelType.CLEAR_GRAPH, handle_clear_graph, ClearGraph),
+        subscribe_to_queue(ChannelType.DOCUMENT_GRAPH_UPDATED, handle_document_graph_updated, DocumentGraphUpdated, concurrency=channel_concurrency(ChannelType.DOCUMENT_GRAPH_UPDATED, 2)),
+        subscribe_to_queue(ChannelType.EMBEDDING_PLOT_REQUESTED, handle_plot_request, CreateEmbeddingPlot, concurrency=channel_concurrency(ChannelType.EMBEDDING_PLOT_REQUESTED, 2)),
+        subscribe_to_queue(ChannelType.CLEAR_GRAPH, handle_clear_graph, ClearGraph, concurrency=1),
+        subscribe_to_queue(ChannelType.GRAPH_UPDATED, handle_graph_changed, GraphUpdated),
+        subscribe_to_queue(ChannelType.DOCUMENT_EMBEDDED, handle_graph_changed, DocumentEmbedded),
     )
 
 if __name__ == "__main__":
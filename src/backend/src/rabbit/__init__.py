@@ -2,7 +2,10 @@ from .main import (
     create_connection,
     check_connection,
     subscribe_to_queue,
+    channel_concurrency,
+    run_blocking,
     get_publisher,
     publish_message,
+    close_publisher,
     ChannelType
 )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class AddPapersById(BaseModel):
     paper_ids: List[str]
@@ -13,9 +13,18 @@ class AddPapersByTitle(BaseModel):
 
 class AddPaperCitations(BaseModel):
     paper_ids: List[str]
+    limit: Optional[int] = None
 
 class AddPaperReferences(BaseModel):
     paper_ids: List[str]
+    limit: Optional[int] = None
+
+class CrawlPaperGraph(BaseModel):
+    paper_ids: List[str]
+    depth: int = Field(default=1, ge=1)
+    direction: Literal["citations", "references", "both"] = "references"
+    fan_out: Optional[int] = Field(default=50, ge=1)
+    min_citation_count: Optional[int] = None
 
 class ClearGraph(BaseModel):
     reason: str
@@ -53,6 +53,9 @@ class DocumentCreated(BaseModel):
 class DocumentGraphUpdated(BaseModel):
     doc: DocumentCreated
 
+class DocumentEmbedded(BaseModel):
+    docId: str
+
 class DocumentsCreated(BaseModel):
     documents: List[DocumentCreated]
     project_id: Optional[str] = None
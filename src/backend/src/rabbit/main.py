@@ -1,10 +1,12 @@
+import asyncio
 import os
-from aio_pika import connect_robust, Message, ExchangeType, Channel
+from aio_pika import connect_robust, Message, ExchangeType, Channel, DeliveryMode
 import logging
 from enum import Enum, auto
 import json
 from pydantic import BaseModel
-from typing import Awaitable, Callable, Type
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,6 +14,9 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 RABBITMQ_USER = os.getenv("RABBITMQ_USERNAME")
 RABBITMQ_PASSWORD = os.getenv("RABBITMQ_PASSWORD")
+PUBLISHER_CONNECTIONS = int(os.getenv("RABBITMQ_PUBLISHER_CONNECTIONS", 1))
+PUBLISHER_CHANNELS = int(os.getenv("RABBITMQ_PUBLISHER_CHANNELS", 8))
+CONSUMER_CONCURRENCY = int(os.getenv("RABBITMQ_CONSUMER_CONCURRENCY", 1))
 
 class ChannelType(Enum):
     ADD_PAPER = auto()
@@ -29,6 +34,8 @@ class ChannelType(Enum):
     DOCUMENT_GRAPH_UPDATED = auto()
     EMBEDDING_PLOT_REQUESTED = auto()
     EMBEDDING_PLOT_CREATED = auto()
+    CRAWL_PAPERS = auto()
+    DOCUMENT_EMBEDDED = auto()
 
 def serialize_message(message: BaseModel) -> bytes:
     return message.json().encode("utf-8")
@@ -56,6 +63,23 @@ async def check_connection():
         return False
 
 EXCHANGE_SUFFIX = ".broadcast"
+WORK_QUEUE_SUFFIX = ".work"
+
+# Command channels are consumed from one named durable queue shared by every worker replica,
+# so each command is handled once. All other channels are events fanned out to every subscriber.
+WORK_CHANNELS = frozenset({
+    ChannelType.ADD_PAPER,
+    ChannelType.ADD_PAPER_BY_TITLE,
+    ChannelType.ADD_CITATIONS,
+    ChannelType.ADD_REFERENCES,
+    ChannelType.CRAWL_PAPERS,
+    ChannelType.CLEAR_GRAPH,
+    ChannelType.CHAT_MESSAGE,
+    ChannelType.CHAT_MESSAGE_CREATED,
+    ChannelType.DOCUMENTS_CREATED,
+    ChannelType.DOCUMENT_GRAPH_UPDATED,
+    ChannelType.EMBEDDING_PLOT_REQUESTED,
+})
 
 
 def exchange_name(channel_type: ChannelType) -> str:
@@ -63,24 +87,123 @@ def exchange_name(channel_type: ChannelType) -> str:
     return f"{channel_type.name}{EXCHANGE_SUFFIX}"
 
 
+def work_queue_name(channel_type: ChannelType) -> str:
+    """Durable queue shared by all consumers of a command channel."""
+    return f"{channel_type.name}{WORK_QUEUE_SUFFIX}"
+
+
+def make_message(channel_type: ChannelType, message: BaseModel) -> Message:
+    # Commands sit in durable queues, so persist them to survive a broker restart
+    if channel_type in WORK_CHANNELS:
+        return Message(body=serialize_message(message), delivery_mode=DeliveryMode.PERSISTENT)
+    return Message(body=serialize_message(message))
+
+
 async def _get_channel() -> Channel:
     connection = await create_connection()
     return await connection.channel()
 
+class Publisher:
+    """
+    Process-wide publisher that keeps long-lived robust connections and a pool of channels.
+    Declared exchanges are cached per channel; if a publish fails the pool is rebuilt and the
+    message is retried once.
+    """
+    def __init__(self, connection_count: int = PUBLISHER_CONNECTIONS, channel_count: int = PUBLISHER_CHANNELS):
+        self.connection_count = max(connection_count, 1)
+        self.channel_count = max(channel_count, 1)
+        self._connections = []
+        self._channels: asyncio.Queue | None = None
+        self._exchanges: Dict[Tuple[int, str], Any] = {}
+        self._lock = asyncio.Lock()
+
+    async def _ensure_pool(self) -> asyncio.Queue:
+        async with self._lock:
+            if self._channels is None:
+                connections = [await create_connection() for _ in range(self.connection_count)]
+                channels = asyncio.Queue()
+                for i in range(self.channel_count):
+                    channels.put_nowait(await connections[i % len(connections)].channel())
+                self._connections = connections
+                self._channels = channels
+            return self._channels
+
+    async def _exchange(self, channel: Channel, channel_type: ChannelType):
+        key = (id(channel), exchange_name(channel_type))
+        exchange = self._exchanges.get(key)
+        if exchange is None:
+            exchange = await channel.declare_exchange(
+                exchange_name(channel_type),
+                ExchangeType.FANOUT,
+                durable=True,
+            )
+            self._exchanges[key] = exchange
+        return exchange
+
+    async def _publish_once(self, channels: asyncio.Queue, channel_type: ChannelType, message: BaseModel):
+        channel = await channels.get()
+        try:
+            exchange = await self._exchange(channel, channel_type)
+            await exchange.publish(
+                make_message(channel_type, message),
+                routing_key="",
+            )
+        finally:
+            if channels is self._channels:
+                channels.put_nowait(channel)
+
+    async def publish(self, channel_type: ChannelType, message: BaseModel):
+        channels = await self._ensure_pool()
+        try:
+            await self._publish_once(channels, channel_type, message)
+        except Exception as e:
+            logger.warning(f"Publishing to {exchange_name(channel_type)} failed, reconnecting: {e}")
+            await self._reset(channels)
+            await self._publish_once(await self._ensure_pool(), channel_type, message)
+
+    async def _reset(self, failed: asyncio.Queue):
+        """Drop the pool `failed` came from, unless a concurrent publish already replaced it."""
+        async with self._lock:
+            if self._channels is not failed:
+                return
+            connections = self._detach()
+        await self._close_connections(connections)
+
+    def _detach(self):
+        connections = self._connections
+        self._connections = []
+        self._channels = None
+        self._exchanges = {}
+        return connections
+
+    async def _close_connections(self, connections):
+        for connection in connections:
+            try:
+                await connection.close()
+            except Exception as e:
+                logger.error(f"Error closing RabbitMQ connection: {e}")
+
+    async def close(self):
+        async with self._lock:
+            connections = self._detach()
+        await self._close_connections(connections)
+
+_publisher: Publisher | None = None
+
+def get_default_publisher() -> Publisher:
+    global _publisher
+    if _publisher is None:
+        _publisher = Publisher()
+    return _publisher
+
+async def close_publisher():
+    global _publisher
+    if _publisher is not None:
+        await _publisher.close()
+        _publisher = None
+
 async def publish_message(channel_type: ChannelType, message: BaseModel):
-    # Get the connection
-    connection = await create_connection()
-    async with connection:
-        channel = await connection.channel()
-        exchange = await channel.declare_exchange(
-            exchange_name(channel_type),
-            ExchangeType.FANOUT,
-            durable=True,
-        )
-        await exchange.publish(
-            Message(body=serialize_message(message)),
-            routing_key="",
-        )
+    await get_default_publisher().publish(channel_type, message)
 
 
 async def get_publisher(channel_type: ChannelType):
@@ -94,13 +217,24 @@ async def get_publisher(channel_type: ChannelType):
 
     async def _publish(message: BaseModel):
         await exchange.publish(
-            Message(body=serialize_message(message)),
+            make_message(channel_type, message),
             routing_key="",
         )
 
     return _publish, connection
 
 
+def channel_concurrency(channel_type: ChannelType, default: int = CONSUMER_CONCURRENCY) -> int:
+    """Consumer concurrency for a channel, overridable with RABBITMQ_<CHANNEL>_CONCURRENCY."""
+    return max(int(os.getenv(f"RABBITMQ_{channel_type.name}_CONCURRENCY", default)), 1)
+
+
+async def run_blocking(func: Callable[..., Any], *args, executor: Optional[Executor] = None) -> Any:
+    """Run a blocking handler step in an executor so it does not stall other consumers."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, lambda: func(*args))
+
+
 async def subscribe_to_queue(
     channel_type: ChannelType,
     callback: Callable[[BaseModel], Awaitable[None]],
@@ -108,11 +242,32 @@ async def subscribe_to_queue(
     *,
     queue_name: str | None = None,
     durable: bool = False,
+    work_queue: bool | None = None,
+    concurrency: int | None = None,
+    prefetch_count: int | None = None,
 ) -> None:
+    """
+    Consume `channel_type` messages, running up to `concurrency` callbacks at once.
+
+    Command channels (WORK_CHANNELS, or `work_queue=True`) are consumed from a durable queue
+    shared with every other consumer of the channel, so each message is handled by one of
+    them. Other channels get a private queue receiving every message.
+
+    Each message is acked when its callback completes (rejected if it raises). The broker
+    delivers at most `prefetch_count` unacked messages, defaulting to `concurrency`. With a
+    concurrency of 1 messages are handled strictly in order.
+    """
+    concurrency = concurrency or channel_concurrency(channel_type)
+    prefetch_count = prefetch_count or concurrency
+    if work_queue is None:
+        work_queue = channel_type in WORK_CHANNELS
+    if work_queue and queue_name is None:
+        queue_name, durable = work_queue_name(channel_type), True
     connection = await create_connection()
 
     async with connection:
         channel = await connection.channel()
+        await channel.set_qos(prefetch_count=prefetch_count)
 
         # Declare fan out exchange
         exchange = await channel.declare_exchange(
@@ -121,7 +276,7 @@ async def subscribe_to_queue(
             durable=True,
         )
 
-        # Create private queue
+        # Create private queue, or join the shared work queue
         if queue_name is None:
             queue = await channel.declare_queue(exclusive=True)
         else:
@@ -130,9 +285,27 @@ async def subscribe_to_queue(
         # Bind queue
         await queue.bind(exchange)
 
-        # Consume messages
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def handle(message):
+            try:
                 async with message.process():
                     data = deserialize_message(message.body, model)
-                    await callback(data)
\ No newline at end of file
+                    await callback(data)
+            except Exception as e:
+                logger.exception(f"Error handling {channel_type.name} message: {e}")
+            finally:
+                semaphore.release()
+
+        # Consume messages
+        try:
+            async with queue.iterator() as queue_iter:
+                async for message in queue_iter:
+                    await semaphore.acquire()
+                    task = asyncio.create_task(handle(message))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,41 +1,83 @@
 from .models import Paper, Author, PartialPaper, Citation, PaperRelevanceResult
-from .util import RateLimitExceededError, retry
-import requests
-import json
+from .client import get_client
+from .cache import ResponseCache, get_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
 
 DEFAULT_PAPER_FIELDS = "title,abstract,venue,publicationVenue,year,referenceCount,citationCount,influentialCitationCount,publicationTypes,publicationDate,journal,authors"
 DEFAULT_AUTHOR_FIELDS = "authorId,url,name,affiliations,homepage,paperCount,citationCount,hIndex"
 
-def relevance_search(text, limit = 100) -> list[PaperRelevanceResult]:
-    url = f"https://api.semanticscholar.org/graph/v1/paper/search?query={text}&fields=title,authors,year&limit={limit}"
-    response = requests.get(url)
+# Maximum number of ids Semantic Scholar accepts per batch request
+PAPER_BATCH_LIMIT = 500
+AUTHOR_BATCH_LIMIT = 1000
+# Maximum page size of the /citations and /references endpoints
+CITATION_PAGE_LIMIT = 1000
+
+async def _cached(endpoint: str, item_id: str, params: dict, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    cache = get_cache()
+    key = ResponseCache.make_key(endpoint, item_id, params)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, endpoint, key)
+        if cached is not None:
+            return cached
+    value = await fetch()
+    if cache is not None and value is not None:
+        await asyncio.to_thread(cache.set, endpoint, key, value)
+    return value
+
+async def _post_batch(path: str, ids: list[str], params: dict) -> list[Optional[dict]]:
+    response = await get_client().post(path, params=params, json={'ids': ids})
+    response.raise_for_status()
+    return response.json()
+
+async def _fetch_batch(endpoint: str, path: str, ids: list[str], fields: str, limit: int) -> list[Optional[dict]]:
+    """
+    Raw batch records in input order (None for unknown ids). Only ids missing from the cache are
+    requested, split into `limit`-sized chunks that are dispatched concurrently; the shared client
+    rate limit paces the actual requests.
+    """
+    cache = get_cache()
+    params = {'fields': fields}
+    keys = {item_id: ResponseCache.make_key(endpoint, item_id, params) for item_id in ids}
+    # SQLite lookups run off the event loop so they do not stall other handlers
+    cached = await asyncio.to_thread(cache.get_many, endpoint, list(keys.values())) if cache is not None else {}
+    missing = [item_id for item_id in keys if keys[item_id] not in cached]
+
+    fetched = {}
+    if missing:
+        chunks = [missing[start:start + limit] for start in range(0, len(missing), limit)]
+        results = await asyncio.gather(*(_post_batch(path, chunk, params) for chunk in chunks))
+        for chunk, records in zip(chunks, results):
+            fetched.update(zip(chunk, records))
+        if cache is not None:
+            await asyncio.to_thread(cache.set_many, endpoint, {keys[item_id]: record for item_id, record in fetched.items() if record is not None})
+
+    return [cached.get(keys[item_id], fetched.get(item_id)) for item_id in ids]
+
+async def relevance_search(text, limit = 100) -> list[PaperRelevanceResult]:
+    params = {"query": text, "fields": "title,authors,year", "limit": limit}
+    response = await get_client().get("/graph/v1/paper/search", params=params)
     if response.status_code == 200:
         data = response.json()
         if data.get("data"):
             return PaperRelevanceResult.schema().load(data.get("data"), many=True)
         else:
             return []
-    elif response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
     else:
         response.raise_for_status()
 
-def partial_search(text) -> list[PartialPaper]:
-    url = f"https://api.semanticscholar.org/graph/v1/paper/search?query={text}"
-    response = requests.get(url)
+async def partial_search(text) -> list[PartialPaper]:
+    response = await get_client().get("/graph/v1/paper/search", params={"query": text})
     if response.status_code == 200:
         data = response.json()
         if data.get("matches"):
             return PartialPaper.schema().load(data.get("matches"), many=True)
         else:
             return []
-    elif response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
     else:
         response.raise_for_status()
 
-def title_search(title, year=None, fields = DEFAULT_PAPER_FIELDS) -> list[Paper]:
-    url = "https://api.semanticscholar.org/graph/v1/paper/search"
+async def title_search(title, year=None, fields = DEFAULT_PAPER_FIELDS) -> list[Paper]:
     params = {
         "query": f"title:({title})",
         "fields": fields
@@ -43,87 +85,89 @@ def title_search(title, year=None, fields = DEFAULT_PAPER_FIELDS) -> list[Paper]
     if year and year > 0:
         params['year'] = year
 
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        if data.get("data"):
-            return Paper.schema().load(data.get("data"), many=True)
-        else:
-            return []
-    elif response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
-    else:
+    async def fetch():
+        response = await get_client().get("/graph/v1/paper/search", params=params)
         response.raise_for_status()
+        return response.json().get("data") or []
 
-def enrich_papers(paper_ids: list[str], fields: str = DEFAULT_PAPER_FIELDS) -> list[Paper]:
-    url = f"https://api.semanticscholar.org/graph/v1/paper/batch"
-    params = { 'fields': fields }
-    paper_ids = { 'ids': paper_ids }
-    response = requests.post(url, params=params, json=paper_ids)
-    if response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
-    return Paper.schema().load(response.json(), many=True)
-
-def enrich_authors(author_ids: list[str], fields: str = DEFAULT_AUTHOR_FIELDS) -> list[Author]:
-    url = f"https://api.semanticscholar.org/graph/v1/author/batch"
-    params = {'fields': fields}
-    author_ids_payload = {'ids': author_ids}
+    data = await _cached("paper/search/title", title, params, fetch)
+    return Paper.schema().load(data, many=True)
 
-    response = requests.post(url, params=params, json=author_ids_payload)
-    if response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
+async def enrich_papers(paper_ids: list[str], fields: str = DEFAULT_PAPER_FIELDS) -> list[Optional[Paper]]:
+    """Papers in the order of `paper_ids`, with None for ids Semantic Scholar does not know."""
+    data = await _fetch_batch("paper/batch", "/graph/v1/paper/batch", paper_ids, fields, PAPER_BATCH_LIMIT)
+    schema = Paper.schema()
+    return [schema.load(record) if record is not None else None for record in data]
 
-    data = response.json()
-    data = filter(lambda x: x is not None, data)
-    return Author.schema().load(data, many=True)
+async def enrich_authors(author_ids: list[str], fields: str = DEFAULT_AUTHOR_FIELDS) -> list[Optional[Author]]:
+    """Authors in the order of `author_ids`, with None for ids Semantic Scholar does not know."""
+    data = await _fetch_batch("author/batch", "/graph/v1/author/batch", author_ids, fields, AUTHOR_BATCH_LIMIT)
+    schema = Author.schema()
+    return [schema.load(record) if record is not None else None for record in data]
 
-def get_citations(paper_id: str) -> list[Citation]:
-    base_url = f"https://api.semanticscholar.org/graph/v1/paper/{paper_id}/citations"
-    response = requests.get(base_url, params={})
-    if response.status_code == 200:
-        data = response.json()
-        papers = [d['citingPaper'] for d in data['data']]
-        return Citation.schema().load(papers, many=True)
-    elif response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
-    else:
-        print(f"Error {response.status_code}: Unable to fetch citations for paper ID {paper_id}")
-        return []
-    
-def get_references(paper_id: str) -> list[Citation]:
-    base_url = f"https://api.semanticscholar.org/graph/v1/paper/{paper_id}/references"
-    params = {}
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        references = [
-            d["citedPaper"]
-            for d in (data.get("data") or [])
-            if d.get("citedPaper") and d["citedPaper"].get("paperId") is not None
-        ]
-        return Citation.schema().load(references, many=True)
-    elif response.status_code == 429:
-        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
-    else:
-        print(f"Error {response.status_code}: Unable to fetch citations for paper ID {paper_id}")
-        return None
-    
-def get_recommendations(positive_paper_ids, negative_paper_ids, limit = 100) -> list[Citation]:
-    url = f"http://api.semanticscholar.org/recommendations/v1/papers?fields=paperId,title&limit={limit}"
+async def _iter_linked_papers(resource: str, paper_id: str, key: str, max_results: Optional[int], page_size: int, fields: Optional[str]) -> AsyncIterator[list[Citation]]:
+    """Follow the `next` offsets of a citations/references listing, yielding each page of linked papers."""
+    offset = 0
+    remaining = max_results
+    while remaining is None or remaining > 0:
+        params = {"offset": offset, "limit": page_size if remaining is None else min(page_size, remaining)}
+        if fields:
+            params["fields"] = fields
+
+        async def fetch():
+            response = await get_client().get(f"/graph/v1/paper/{paper_id}/{resource}", params=params)
+            if response.status_code != 200:
+                print(f"Error {response.status_code}: Unable to fetch {resource} for paper ID {paper_id} at offset {offset}")
+                return None
+            data = response.json()
+            return {"data": data.get("data") or [], "next": data.get("next")}
+
+        page = await _cached(f"paper/{resource}", paper_id, params, fetch)
+        if page is None:
+            return
+        linked = [d[key] for d in page["data"] if d.get(key) and d[key].get("paperId") is not None]
+        if linked:
+            yield Citation.schema().load(linked, many=True)
+
+        if remaining is not None:
+            remaining -= len(page["data"])
+        if page["next"] is None or not page["data"]:
+            return
+        offset = page["next"]
+
+def iter_citations(paper_id: str, max_results: Optional[int] = None, page_size: int = CITATION_PAGE_LIMIT, fields: Optional[str] = None) -> AsyncIterator[list[Citation]]:
+    """Pages of papers citing `paper_id`, stopping after `max_results` citations when given."""
+    return _iter_linked_papers("citations", paper_id, "citingPaper", max_results, page_size, fields)
+
+def iter_references(paper_id: str, max_results: Optional[int] = None, page_size: int = CITATION_PAGE_LIMIT, fields: Optional[str] = None) -> AsyncIterator[list[Citation]]:
+    """Pages of papers referenced by `paper_id`, stopping after `max_results` references when given."""
+    return _iter_linked_papers("references", paper_id, "citedPaper", max_results, page_size, fields)
+
+async def get_citations(paper_id: str, max_results: Optional[int] = None) -> list[Citation]:
+    return [citation async for page in iter_citations(paper_id, max_results) for citation in page]
+
+async def get_references(paper_id: str, max_results: Optional[int] = None) -> list[Citation]:
+    return [reference async for page in iter_references(paper_id, max_results) for reference in page]
+
+async def get_recommendations(positive_paper_ids, negative_paper_ids, limit = 100) -> list[Citation]:
     params = {
         "positivepaper_ids": positive_paper_ids,
         "negativepaper_ids": negative_paper_ids
     }
-    response = requests.post(url, data=json.dumps(params))
+    response = await get_client().post(
+        "/recommendations/v1/papers",
+        params={"fields": "paperId,title", "limit": limit},
+        json=params,
+    )
     if response.status_code == 200:
         data = response.json()
         return Citation.schema().load(data.get("recommendedPapers", []), many=True)
     else:
         print(f"Failed to get recommendations: {response.status_code} {response.text}")
         return []
-    
-def search_papers_by_title(title:str, year:int) -> Paper:
-    res = retry(title_search, title, year)
+
+async def search_papers_by_title(title:str, year:int) -> Paper:
+    res = await title_search(title, year)
     if len(res) > 0:
         return res[0]
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,187 @@
+"""
+Persistent Semantic Scholar response cache.
+Stores JSON payloads in SQLite keyed by endpoint, id and request fields, with per-endpoint TTLs,
+least-recently-used eviction under a byte budget and hit/miss counters.
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+S2_CACHE_PATH = os.getenv("SEMANTIC_SCHOLAR_CACHE_PATH", "/data/semantic_scholar_cache.db")
+S2_CACHE_MAX_BYTES = int(float(os.getenv("SEMANTIC_SCHOLAR_CACHE_MAX_MB", 512)) * 1024 * 1024)
+S2_CACHE_SWEEP_INTERVAL = float(os.getenv("SEMANTIC_SCHOLAR_CACHE_SWEEP_INTERVAL", 3600))
+
+DAY = 24 * 60 * 60
+DEFAULT_TTLS = {
+    "paper/batch": 30 * DAY,
+    "author/batch": 14 * DAY,
+    "paper/search/title": 7 * DAY,
+    "paper/citations": 3 * DAY,
+    "paper/references": 30 * DAY,
+}
+DEFAULT_TTL = DAY
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = S2_CACHE_PATH,
+        max_bytes: int = S2_CACHE_MAX_BYTES,
+        ttls: Optional[Dict[str, float]] = None,
+        sweep_interval: float = S2_CACHE_SWEEP_INTERVAL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_expires_at ON responses (expires_at)")
+        # Kept up to date on every write so that writes never have to scan the table
+        self._bytes = self._total_bytes()
+        self._swept_at = time.monotonic()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(endpoint: str, item_id: str, params: Optional[Dict] = None) -> str:
+        raw = json.dumps([endpoint, item_id, params or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, endpoint: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the unexpired payloads for `keys`, counting a hit or miss for each key."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now),
+                ).fetchall()
+                found.update({key: json.loads(value) for key, value in rows})
+            if found:
+                self._conn.executemany(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            self.hits[endpoint] += len(found)
+            self.misses[endpoint] += len(keys) - len(found)
+        return found
+
+    def get(self, endpoint: str, key: str) -> Optional[Any]:
+        return self.get_many(endpoint, [key]).get(key)
+
+    def set_many(self, endpoint: str, items: Dict[str, Any]):
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + self.ttls.get(endpoint, DEFAULT_TTL)
+        rows = []
+        for key, value in items.items():
+            encoded = json.dumps(value)
+            rows.append((key, endpoint, encoded, len(encoded), expires_at, now))
+        with self._lock:
+            replaced = 0
+            for start in range(0, len(rows), 500):
+                chunk = [row[0] for row in rows[start:start + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM responses WHERE key IN ({placeholders})", chunk
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, endpoint, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._bytes += sum(row[3] for row in rows) - replaced
+        if self._bytes > self.max_bytes or time.monotonic() - self._swept_at >= self.sweep_interval:
+            self.evict()
+
+    def set(self, endpoint: str, key: str, value: Any):
+        self.set_many(endpoint, {key: value})
+
+    def size(self) -> int:
+        return self._bytes
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits its byte budget."""
+        with self._lock:
+            now = time.time()
+            self._swept_at = time.monotonic()
+            # Other worker replicas write to the same file, so the running total is resynced
+            self._bytes = self._total_bytes()
+            self._bytes -= self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires_at <= ?", (now,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            if self._bytes <= self.max_bytes:
+                return
+            excess = self._bytes - self.max_bytes
+            freed = 0
+            stale = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                stale.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            self._bytes -= freed
+            logger.info(f"Evicted {len(stale)} Semantic Scholar cache entries ({freed} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "bytes": self.size(),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[ResponseCache] = None
+_cache_failed = False
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when caching is disabled or the cache file cannot be opened."""
+    global _cache, _cache_failed
+    if _cache is None and not _cache_failed:
+        if not S2_CACHE_PATH:
+            _cache_failed = True
+            return None
+        try:
+            _cache = ResponseCache()
+        except Exception as e:
+            logger.warning(f"Semantic Scholar cache disabled, unable to open {S2_CACHE_PATH}: {e}")
+            _cache_failed = True
+    return _cache
@@ -0,0 +1,110 @@
+"""
+Shared asynchronous Semantic Scholar client.
+Keeps connections alive on a single httpx.AsyncClient, rate limits every request through
+a token bucket shared by all coroutines and retries throttled requests with jittered backoff.
+"""
+
+from .util import RateLimitExceededError, TokenBucket, jittered_delay
+from typing import Optional
+import asyncio
+import httpx
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+S2_BASE_URL = "https://api.semanticscholar.org"
+S2_API_KEY = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
+S2_RATE_LIMIT = float(os.getenv("SEMANTIC_SCHOLAR_RATE_LIMIT", 1.0))
+S2_MAX_RETRIES = int(os.getenv("SEMANTIC_SCHOLAR_MAX_RETRIES", 8))
+S2_TIMEOUT = float(os.getenv("SEMANTIC_SCHOLAR_TIMEOUT", 30.0))
+S2_MAX_CONNECTIONS = int(os.getenv("SEMANTIC_SCHOLAR_MAX_CONNECTIONS", 10))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class SemanticScholarClient:
+    def __init__(
+        self,
+        base_url: str = S2_BASE_URL,
+        api_key: Optional[str] = S2_API_KEY,
+        rate_limit: float = S2_RATE_LIMIT,
+        max_retries: int = S2_MAX_RETRIES,
+        base_delay: float = 1,
+        max_delay: float = 32,
+        timeout: float = S2_TIMEOUT,
+        max_connections: int = S2_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.headers = {"x-api-key": api_key} if api_key else {}
+        self.limiter = TokenBucket(rate_limit)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a rate-limited request, retrying throttled, 5xx and transport failures.
+
+        Raises:
+            RateLimitExceededError: If the request is still throttled after max_retries attempts.
+        """
+        for attempt in range(1, self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Semantic Scholar request {method} {path} failed: {e}. Retrying...")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if attempt == self.max_retries:
+                    if response.status_code == 429:
+                        raise RateLimitExceededError("Rate limit exceeded. Please wait before retrying.")
+                    return response
+                logger.info(f"Semantic Scholar returned {response.status_code} for {path}, retrying (attempt {attempt})")
+            await asyncio.sleep(jittered_delay(attempt, self.base_delay, self.max_delay))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+_client: Optional[SemanticScholarClient] = None
+
+def get_client() -> SemanticScholarClient:
+    """Process-wide client so every caller shares one connection pool and rate limit."""
+    global _client
+    if _client is None:
+        _client = SemanticScholarClient()
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
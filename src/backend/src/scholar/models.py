@@ -61,6 +61,7 @@ class PaperRelevanceResult:
 class Citation:
     paperId: str
     title: str
+    citationCount: Optional[int] = None
 
 @dataclass_json(undefined=EXCLUDE)
 @dataclass
@@ -1,3 +1,5 @@
+import asyncio
+import random
 import time
 
 class RateLimitExceededError(Exception):
@@ -104,4 +106,64 @@ async def retry_async(
                 time.sleep(delay)
         except Exception as e:
             print(f"An error occurred: {e}")
-            raise
\ No newline at end of file
+            raise
+
+def jittered_delay(attempt, base_delay=1, max_delay=32):
+    """
+    Full-jitter exponential backoff delay for the given (1-based) attempt.
+
+    Returns a random delay between 0 and min(base_delay * 2**(attempt - 1), max_delay)
+    so that concurrent callers retrying after the same failure spread out.
+    """
+    return random.uniform(0, min(base_delay * 2**(attempt - 1), max_delay))
+
+class TokenBucket:
+    """
+    Asynchronous token-bucket rate limiter shared across coroutines.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens that can accumulate. Defaults to 1.
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+async def read_ahead(iterator):
+    """
+    Iterate an async iterator while the next item is already being fetched.
+
+    The following item is requested as soon as the current one is handed out, so consumer work
+    on item N overlaps with producing item N + 1.
+    """
+    iterator = aiter(iterator)
+    pending = asyncio.ensure_future(anext(iterator))
+    try:
+        while True:
+            try:
+                item = await pending
+            except StopAsyncIteration:
+                return
+            pending = asyncio.ensure_future(anext(iterator))
+            yield item
+    finally:
+        if not pending.done():
+            pending.cancel()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from api.graph_cache import GraphSnapshotCache
+
+
+@pytest.mark.asyncio
+async def test_get_reuses_snapshot_until_version_is_bumped():
+    cache = GraphSnapshotCache()
+    loads = []
+
+    start = cache.version
+
+    def load():
+        loads.append(cache.version)
+        return {"nodes": len(loads)}
+
+    assert await cache.get(load) == (start, {"nodes": 1})
+    assert await cache.get(load) == (start, {"nodes": 1})
+
+    cache.bump()
+
+    assert await cache.get(load) == (start + 1, {"nodes": 2})
+    assert loads == [start, start + 1]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_load():
+    cache = GraphSnapshotCache()
+    calls = {"count": 0}
+
+    def load():
+        calls["count"] += 1
+        return {"nodes": []}
+
+    results = await asyncio.gather(*(cache.get(load) for _ in range(5)))
+
+    assert calls["count"] == 1
+    assert all(result == (cache.version, {"nodes": []}) for result in results)
+
+
+def test_etag_matching_tracks_current_version():
+    cache = GraphSnapshotCache()
+    etag = cache.etag
+
+    assert cache.matches(etag)
+    assert cache.matches(f'W/{etag}, "other"')
+    assert not cache.matches(None)
+
+    cache.bump()
+
+    assert not cache.matches(etag)
+    assert cache.etag != etag
+
+
+def test_changes_since_accumulates_node_ids():
+    cache = GraphSnapshotCache()
+    start = cache.version
+    cache.bump(["p1", "p2"])
+    cache.bump(["p2", "p3"])
+
+    assert cache.changes_since(start) == {"p1", "p2", "p3"}
+    assert cache.changes_since(start + 1) == {"p2", "p3"}
+    assert cache.changes_since(cache.version) == set()
+
+
+def test_changes_since_requires_full_reload_for_unknown_scope_or_version():
+    cache = GraphSnapshotCache(change_log_size=2)
+    start = cache.version
+    cache.bump(["p1"])
+    cache.bump([])
+    cache.bump(["p2"])
+
+    assert cache.changes_since(start + 1) is None
+    assert cache.changes_since(start + 2) == {"p2"}
+    assert cache.changes_since(start) is None
+    assert cache.changes_since(cache.version + 1) is None
@@ -64,3 +64,16 @@ def test_disconnect_all_closes_all_connections():
 
     assert ws1.closed is True
     assert ws2.closed is True
+
+
+@pytest.mark.asyncio
+async def test_send_targets_single_websocket():
+    manager = ConnectionManager()
+    ws1 = FakeWebSocket()
+    ws2 = FakeWebSocket()
+    manager.active_connections.update({ws1, ws2})
+
+    await manager.send(ws1, "graph_delta", {"version": 3})
+
+    assert ws1.messages == [{"type": "graph_delta", "body": {"version": 3}}]
+    assert ws2.messages == []
@@ -0,0 +1,64 @@
+import pytest
+
+from kg.db import chat
+
+
+class FakeAdb:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def cypher_query(self, query, params):
+        if self.fail:
+            raise RuntimeError("neo4j unavailable")
+        self.calls.append(params)
+        return [[sum(len(call["text"]) for call in self.calls)]], ("length",)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"now": 0.0}
+    monkeypatch.setattr(chat.time, "monotonic", lambda: state["now"])
+    return state
+
+
+@pytest.mark.asyncio
+async def test_writer_appends_first_fragment_then_at_most_once_per_interval(monkeypatch, clock):
+    fake = FakeAdb()
+    monkeypatch.setattr(chat, "adb", fake)
+    writer = chat.ChatResponseWriter("r1", "m1", interval=2.0)
+
+    await writer.append("Hello")
+    await writer.append(", ")
+    clock["now"] = 1.0
+    await writer.append("wor")
+    clock["now"] = 2.5
+    await writer.append("ld")
+    await writer.append("!")
+    await writer.close()
+
+    assert [call["text"] for call in fake.calls] == ["Hello", ", world", "!"]
+    assert all(call["response_id"] == "r1" and call["message_id"] == "m1" for call in fake.calls)
+    assert writer.writes == 3
+
+
+@pytest.mark.asyncio
+async def test_writer_keeps_text_when_a_write_fails(monkeypatch, clock):
+    fake = FakeAdb(fail=True)
+    monkeypatch.setattr(chat, "adb", fake)
+    writer = chat.ChatResponseWriter("r1", "m1", interval=0)
+
+    await writer.append("partial ")
+    fake.fail = False
+    await writer.append("answer")
+
+    assert [call["text"] for call in fake.calls] == ["partial answer"]
+
+
+@pytest.mark.asyncio
+async def test_append_chat_response_returns_stored_length(monkeypatch):
+    fake = FakeAdb()
+    monkeypatch.setattr(chat, "adb", fake)
+
+    assert await chat.append_chat_response("r1", "m1", "abc") == 3
+    assert fake.calls == [{"response_id": "r1", "message_id": "m1", "text": "abc"}]
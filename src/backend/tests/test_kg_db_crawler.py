@@ -0,0 +1,71 @@
+import pytest
+
+from kg.db import crawler
+from scholar.models import Citation
+
+
+REFERENCES = {
+    "seed": ["a", "b"],
+    "a": ["c", "seed"],
+    "b": ["c", "d"],
+    "c": ["e"],
+}
+
+CITATION_COUNTS = {"a": 10, "b": 1, "c": 10, "d": 10, "e": 10, "seed": 10}
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    state = {"created": [], "edges": [], "fan_outs": []}
+
+    async def iter_references(paper_id, max_results=None, fields=None):
+        state["fan_outs"].append(max_results)
+        ids = REFERENCES.get(paper_id, [])[:max_results]
+        if ids:
+            yield [Citation(paperId=i, title=i, citationCount=CITATION_COUNTS[i]) for i in ids]
+
+    async def create_paper_graph(paper_ids):
+        state["created"].append(list(paper_ids))
+
+    async def write_citations(relations):
+        state["edges"].append(list(relations))
+
+    monkeypatch.setattr(crawler, "iter_references", iter_references)
+    monkeypatch.setattr(crawler, "create_paper_graph", create_paper_graph)
+    monkeypatch.setattr(crawler, "write_citations", write_citations)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_crawl_writes_one_batch_per_level(fake_graph):
+    levels = []
+
+    async def on_level(paper_ids):
+        levels.append(paper_ids)
+
+    visited = await crawler.crawl_paper_graph(["seed"], depth=2, on_level=on_level)
+
+    assert visited == ["seed", "a", "b", "c", "d"]
+    assert fake_graph["created"] == [["seed"], ["a", "b"], ["c", "d"]]
+    assert fake_graph["edges"] == [
+        [("seed", "a"), ("seed", "b")],
+        [("a", "c"), ("a", "seed"), ("b", "c"), ("b", "d")],
+    ]
+    # "seed" is reported again at level 2 for the new a -> seed link
+    assert levels == [["seed"], ["a", "b", "seed"], ["c", "d", "a", "seed", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_crawl_applies_fan_out_and_citation_filter(fake_graph):
+    visited = await crawler.crawl_paper_graph(["seed"], depth=3, fan_out=1, min_citation_count=5)
+
+    assert visited == ["seed", "a", "c", "e"]
+    assert set(fake_graph["fan_outs"]) == {1}
+
+
+@pytest.mark.asyncio
+async def test_crawl_stops_at_max_papers(fake_graph):
+    visited = await crawler.crawl_paper_graph(["seed"], depth=3, max_papers=2)
+
+    assert visited == ["seed", "a"]
+    assert fake_graph["edges"][-1] == [("seed", "a")]
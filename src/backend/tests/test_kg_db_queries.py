@@ -0,0 +1,178 @@
+import numpy as np
+import pytest
+
+from kg.db import queries
+
+
+class FakeDb:
+    def __init__(self, indexes, rows):
+        self.indexes = indexes
+        self.rows = rows
+        self.queries = []
+
+    async def cypher_query(self, query, params=None):
+        self.queries.append((query, params))
+        if query == queries.SHOW_VECTOR_INDEXES_QUERY:
+            return [[name] for name in self.indexes], ("name",)
+        return self.rows, ()
+
+
+@pytest.fixture(autouse=True)
+def reset_index_cache(monkeypatch):
+    monkeypatch.setattr(queries, "_online_vector_indexes", None)
+    monkeypatch.setattr(queries, "_vector_indexes_checked_at", 0.0)
+
+
+def test_vector_index_names_match_neomodel_convention():
+    assert queries.CHUNK_VECTOR_INDEX == "vector_index_Chunk_textEmbedding"
+    assert queries.ABSTRACT_VECTOR_INDEX == "vector_index_Paper_abstract_embedding"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_similar_chunks_uses_vector_index_when_online(monkeypatch):
+    fake = FakeDb([queries.CHUNK_VECTOR_INDEX], [["text", 0.9, "p1", "0_p1", [0.3], "1_p1"]])
+    monkeypatch.setattr(queries, "adb", fake)
+
+    results = await queries.retrieve_similar_chunks([0.1, 0.2], k=5)
+
+    query, params = fake.queries[-1]
+    assert "db.index.vector.queryNodes" in query
+    assert params["index"] == queries.CHUNK_VECTOR_INDEX
+    assert params["k"] == 5
+    assert "NEXT" in query
+    embedding = results[0].pop("embedding")
+    assert embedding.dtype == np.float32 and embedding.tolist() == pytest.approx([0.3])
+    assert results == [{"text": "text", "score": 0.9, "metadata": {"source": "p1", "chunkId": "0_p1", "nextChunkId": "1_p1"}}]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_similar_abstracts_falls_back_to_scan_without_index(monkeypatch):
+    fake = FakeDb([], [["Title: t", 0.7, "p1", [0.4]]])
+    monkeypatch.setattr(queries, "adb", fake)
+
+    results = await queries.retrieve_similar_abstracts([0.1], k=3)
+
+    query, _ = fake.queries[-1]
+    assert "vector.similarity.cosine" in query
+    assert "score > 0.5" in query
+    embedding = results[0].pop("embedding")
+    assert embedding.dtype == np.float32 and embedding.tolist() == pytest.approx([0.4])
+    assert results == [{"text": "Title: t", "score": 0.7, "metadata": {"paper_id": "p1"}}]
+
+
+@pytest.mark.asyncio
+async def test_index_lookup_is_cached(monkeypatch):
+    fake = FakeDb([queries.CHUNK_VECTOR_INDEX], [])
+    monkeypatch.setattr(queries, "adb", fake)
+
+    await queries.retrieve_similar_chunks([0.1])
+    await queries.retrieve_similar_chunks([0.1])
+
+    show_calls = [q for q, _ in fake.queries if q == queries.SHOW_VECTOR_INDEXES_QUERY]
+    assert len(show_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_index_is_rechecked_after_interval(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(queries.time, "monotonic", lambda: clock["now"])
+    fake = FakeDb([], [])
+    monkeypatch.setattr(queries, "adb", fake)
+
+    assert not await queries.has_vector_index(queries.CHUNK_VECTOR_INDEX)
+    fake.indexes = [queries.CHUNK_VECTOR_INDEX]
+    assert not await queries.has_vector_index(queries.CHUNK_VECTOR_INDEX)
+
+    clock["now"] += queries.VECTOR_INDEX_RECHECK_INTERVAL
+    assert await queries.has_vector_index(queries.CHUNK_VECTOR_INDEX)
+    show_calls = [q for q, _ in fake.queries if q == queries.SHOW_VECTOR_INDEXES_QUERY]
+    assert len(show_calls) == 2
+
+
+class FakeSession:
+    def __init__(self, nodes, edges):
+        self.nodes = nodes
+        self.edges = edges
+        self.runs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def run(self, query, **params):
+        self.runs.append((query, params))
+        if query == queries.GRAPH_EDGE_PAGE_QUERY:
+            return iter(self.edges)
+        label = query.split("MATCH (n:")[1].split(")")[0]
+        rows = [row for row in self.nodes.get(label, []) if params["cursor"] is None or row["key"] > params["cursor"]]
+        return iter(rows[:params["limit"]])
+
+
+class FakeDriver:
+    def __init__(self, session):
+        self._session = session
+
+    def session(self):
+        return self._session
+
+
+def test_graph_node_page_query_seeks_on_label_key():
+    query = queries.graph_node_page_query("Paper", "paper_id", after=True)
+
+    assert "MATCH (n:Paper)" in query
+    assert "n.paper_id > $cursor" in query
+    assert "ORDER BY n.paper_id" in query
+    assert "elementId(n) >" not in query
+
+
+def test_stream_graph_page_yields_nodes_edges_and_next_cursor():
+    session = FakeSession(
+        nodes={
+            "Paper": [{"id": "4:a", "label": "Paper", "key": "p1", "properties": [["title", "A"]]}],
+            "Author": [
+                {"id": "4:b", "label": "Author", "key": "a1", "properties": [["name", "B"]]},
+                {"id": "4:c", "label": "Author", "key": "a2", "properties": [["name", "C"]]},
+            ],
+        },
+        edges=[{"source": "4:b", "target": "4:a", "type": "AUTHORED", "properties": {}}],
+    )
+
+    items = list(queries.stream_graph_page(FakeDriver(session), page_size=2))
+
+    assert items == [
+        {"type": "node", "data": {"id": "4:a", "label": "Paper", "properties": {"title": "A"}}},
+        {"type": "node", "data": {"id": "4:b", "label": "Author", "properties": {"name": "B"}}},
+        {"type": "edge", "data": {"source": "4:b", "target": "4:a", "type": "AUTHORED", "properties": {}}},
+        {"type": "page", "data": {"count": 2, "next_cursor": "Author|a1"}},
+    ]
+    assert session.runs[0][1] == {"cursor": None, "limit": 2, "exclude": ["abstract_embedding", "textEmbedding", "abstract"]}
+    assert session.runs[1][1]["limit"] == 1
+    assert session.runs[2][1]["ids"] == ["4:a", "4:b"]
+
+    session.runs = []
+    items = list(queries.stream_graph_page(FakeDriver(session), cursor="Author|a1", page_size=2))
+    assert [item["data"].get("id") for item in items if item["type"] == "node"] == ["4:c"]
+    assert items[-1] == {"type": "page", "data": {"count": 1, "next_cursor": None}}
+    assert session.runs[0][1]["cursor"] == "a1"
+    assert all(params.get("cursor") is None for _, params in session.runs[1:])
+
+
+def test_stream_graph_page_includes_requested_properties_and_ends_on_short_page():
+    session = FakeSession(nodes={}, edges=[])
+
+    items = list(queries.stream_graph_page(FakeDriver(session), cursor="Journal|z", page_size=10, include=["abstract"]))
+
+    assert items == [{"type": "page", "data": {"count": 0, "next_cursor": None}}]
+    assert [params for _, params in session.runs] == [
+        {"cursor": "z", "limit": 10, "exclude": ["abstract_embedding", "textEmbedding"]},
+        {"cursor": None, "limit": 10, "exclude": ["abstract_embedding", "textEmbedding"]},
+        {"cursor": None, "limit": 10, "exclude": ["abstract_embedding", "textEmbedding"]},
+    ]
+
+
+def test_parse_graph_cursor_rejects_unknown_labels():
+    assert queries.parse_graph_cursor("Paper|a|b") == ("Paper", "a|b")
+    with pytest.raises(ValueError):
+        queries.parse_graph_cursor("4:abc")
@@ -0,0 +1,68 @@
+import pytest
+
+from kg.db import writer
+
+
+class FakeAdb:
+    def __init__(self, fail_on_batch=None):
+        self.calls = []
+        self.fail_on_batch = fail_on_batch
+
+    async def cypher_query(self, query, params):
+        self.calls.append((query, params))
+        if len(self.calls) - 1 == self.fail_on_batch:
+            raise RuntimeError("boom")
+        return [[len(params["rows"])]], ("written",)
+
+
+def test_batched_splits_rows_into_fixed_size_batches():
+    assert list(writer.batched([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+
+def test_batched_rejects_non_positive_batch_size():
+    with pytest.raises(ValueError):
+        list(writer.batched([1], 0))
+
+
+@pytest.mark.asyncio
+async def test_write_paper_authors_sends_one_query_per_batch(monkeypatch):
+    fake = FakeAdb()
+    monkeypatch.setattr(writer, "adb", fake)
+
+    relations = [("p1", "a1"), ("p1", "a2"), ("p2", "a1")]
+    results = await writer.write_paper_authors(relations, batch_size=2)
+
+    assert len(fake.calls) == 2
+    assert fake.calls[0][0] == writer.AUTHORED_QUERY
+    assert fake.calls[0][1]["rows"] == [
+        {"paper_id": "p1", "author_id": "a1"},
+        {"paper_id": "p1", "author_id": "a2"},
+    ]
+    assert [(r.batch, r.rows, r.written) for r in results] == [(0, 2, 2), (1, 1, 1)]
+
+
+@pytest.mark.asyncio
+async def test_write_citations_orders_rows_citing_to_cited(monkeypatch):
+    fake = FakeAdb()
+    monkeypatch.setattr(writer, "adb", fake)
+
+    await writer.write_citations([("c1", "p1"), ("c2", "p1"), ("c1", "p1")])
+
+    assert fake.calls[0][0] == writer.CITES_QUERY
+    assert fake.calls[0][1]["rows"] == [
+        {"citing_id": "c1", "cited_id": "p1"},
+        {"citing_id": "c2", "cited_id": "p1"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_write_rows_deduplicates_pairs_and_continues_after_failed_batch(monkeypatch):
+    fake = FakeAdb(fail_on_batch=0)
+    monkeypatch.setattr(writer, "adb", fake)
+
+    relations = [("p1", "v1"), ("p1", "v1"), ("p2", "v1")]
+    results = await writer.write_paper_venues(relations, batch_size=1)
+
+    assert len(fake.calls) == 2
+    assert [r.written for r in results] == [0, 1]
+    assert all(r.relation == "PUBLISHED_AT" for r in results)
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from kg.llm import adapter, chat, retrieval_cache
+from kg.llm.conversation import ChatHistory
+from rabbit.events import ChatMessage
+
+
+class FakeLLMAdapter(adapter.BaseLLM):
+    events = []
+
+    def __init__(self, model_id="fake", **kwargs):
+        self.model_id = model_id
+
+    async def astream(self, prompt):
+        async with adapter.model_limit(self.model_id):
+            for token in ["one ", "two ", "three"]:
+                FakeLLMAdapter.events.append((self.model_id, token))
+                await asyncio.sleep(0.01)
+                yield token
+
+
+class FakeEmbeddings:
+    def __init__(self, model_id):
+        pass
+
+    def prepare_query(self, query):
+        return query
+
+    def embed_query(self, text):
+        return [0.0]
+
+
+@pytest.fixture(autouse=True)
+def clear_retrieval_caches():
+    retrieval_cache.query_embeddings.clear()
+    retrieval_cache.retrieval_results.clear()
+
+
+@pytest.fixture
+def fake_chat(monkeypatch, tmp_path):
+    FakeLLMAdapter.events = []
+    monkeypatch.setattr(chat, "OllamaAdapter", FakeLLMAdapter)
+    monkeypatch.setattr(chat, "NomicEmbeddingAdapter", FakeEmbeddings)
+    async def retrieve_chunks(embedding, k):
+        return [{"text": "chunk"}]
+
+    async def retrieve_abstracts(embedding, k):
+        return [{"text": "abstract"}]
+
+    monkeypatch.setattr(chat, "retrieve_similar_chunks", retrieve_chunks)
+    monkeypatch.setattr(chat, "retrieve_similar_abstracts", retrieve_abstracts)
+    db = f"sqlite:///{tmp_path / 'chat.db'}"
+    monkeypatch.setattr(chat, "get_windowed_session_history", lambda session_id: ChatHistory(session_id=session_id, connection_string=db))
+    return db
+
+
+def _message(model):
+    return ChatMessage(message="What is new?", prefix="", chatId="c1", model=model)
+
+
+@pytest.mark.asyncio
+async def test_ask_llm_streams_asynchronously_and_records_history(fake_chat):
+    tokens = [token async for token in chat.ask_llm_kg_with_conversation(_message("m1"), "s1")]
+
+    assert "".join(tokens) == "one two three"
+    history = ChatHistory(session_id="s1", connection_string=fake_chat).messages
+    assert [m.content for m in history] == ["What is new?", "one two three"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_interleave(fake_chat, monkeypatch):
+    monkeypatch.setattr(adapter, "_model_limits", {})
+
+    async def collect(model, session):
+        return [t async for t in chat.ask_llm_kg_with_conversation(_message(model), session)]
+
+    await asyncio.gather(collect("m1", "a"), collect("m1", "b"))
+
+    tokens = [token for _, token in FakeLLMAdapter.events]
+    assert tokens[:2] == ["one ", "one "]
+
+
+@pytest.mark.asyncio
+async def test_model_limit_serializes_generations_beyond_the_cap(fake_chat, monkeypatch):
+    monkeypatch.setattr(adapter, "_model_limits", {})
+    monkeypatch.setattr(adapter, "OLLAMA_MAX_CONCURRENT_REQUESTS", 1)
+
+    async def collect(session):
+        return [t async for t in chat.ask_llm_kg_with_conversation(_message("m1"), session)]
+
+    await asyncio.gather(collect("a"), collect("b"))
+
+    assert [token for _, token in FakeLLMAdapter.events] == ["one ", "two ", "three"] * 2
+
+
+@pytest.mark.asyncio
+async def test_ollama_adapter_astream_holds_model_slot_while_streaming(monkeypatch):
+    monkeypatch.setattr(adapter, "_model_limits", {})
+    ollama = adapter.OllamaAdapter(model_id="m1")
+
+    class FakeOllama:
+        async def astream(self, prompt):
+            assert adapter.model_limit("m1")._value == adapter.OLLAMA_MAX_CONCURRENT_REQUESTS - 1
+            yield "a"
+            yield "b"
+
+    ollama.llm = FakeOllama()
+    wrapper = adapter.LangChainWrapper(adapter=ollama)
+
+    assert [t async for t in ollama.astream("prompt")] == ["a", "b"]
+    assert await wrapper.ainvoke("prompt") == "ab"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_context_runs_searches_concurrently(monkeypatch):
+    # Both searches must be in flight at once to get past the barrier
+    barrier = asyncio.Barrier(2)
+
+    def search(text):
+        async def retrieve(embedding, k):
+            await asyncio.wait_for(barrier.wait(), timeout=2)
+            return [{"text": text}]
+        return retrieve
+
+    monkeypatch.setattr(chat, "retrieve_similar_chunks", search("chunk"))
+    monkeypatch.setattr(chat, "retrieve_similar_abstracts", search("abstract"))
+
+    context = await chat.retrieve_context(FakeEmbeddings("m"), {"question": "q"})
+
+    assert (context["chunks"], context["abstracts"]) == ("chunk", "abstract")
+    assert set(context["retrieval_timings"]) == {"embed", "chunks", "abstracts", "total"}
+
+
+@pytest.mark.asyncio
+async def test_repeated_questions_skip_embedding_and_search(monkeypatch):
+    calls = []
+
+    class CountingEmbeddings(FakeEmbeddings):
+        model_id = "m"
+
+        def embed_query(self, text):
+            calls.append("embed")
+            return [0.5]
+
+    async def retrieve(embedding, k):
+        calls.append("search")
+        return [{"text": "hit"}]
+
+    monkeypatch.setattr(chat, "retrieve_similar_chunks", retrieve)
+    monkeypatch.setattr(chat, "retrieve_similar_abstracts", retrieve)
+    embeddings = CountingEmbeddings("m")
+
+    await chat.retrieve_context(embeddings, {"question": "What is new?"})
+    await chat.retrieve_context(embeddings, {"question": "  what is NEW? "})
+    assert calls == ["embed", "search", "search"]
+
+    retrieval_cache.invalidate_retrieval_cache()
+    await chat.retrieve_context(embeddings, {"question": "What is new?"})
+    assert calls == ["embed", "search", "search", "search", "search"]
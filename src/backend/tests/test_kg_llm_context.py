@@ -0,0 +1,70 @@
+import numpy as np
+
+from kg.llm import context
+from kg.llm.context import Passage, context_budget, join_overlapping, merge_adjacent_chunks, mmr_order, pack_context
+
+
+def _chunk(chunk_id, text, next_id=None, score=0.9, embedding=None):
+    return {
+        "text": "search_document: " + text,
+        "score": score,
+        "embedding": embedding,
+        "metadata": {"source": "p1", "chunkId": chunk_id, "nextChunkId": next_id},
+    }
+
+
+def test_join_overlapping_removes_repeated_seam():
+    assert join_overlapping("alpha beta gamma delta", "gamma delta epsilon") == "alpha beta gamma delta epsilon"
+    assert join_overlapping("alpha", "beta") == "alpha\nbeta"
+
+
+def test_adjacent_chunks_are_merged_into_one_passage():
+    chunks = [
+        _chunk("1_p1", "second part of text. third", "2_p1", score=0.8),
+        _chunk("0_p1", "first part. second part of text.", "1_p1", score=0.7),
+        _chunk("5_p1", "unrelated", "6_p1", score=0.6),
+    ]
+
+    passages = merge_adjacent_chunks(chunks)
+
+    assert [p.text for p in passages] == ["first part. second part of text. third", "unrelated"]
+    assert passages[0].score == 0.8
+
+
+def test_mmr_drops_near_duplicates_and_prefers_diverse_passages():
+    passages = [
+        Passage("chunk", "a", 0.9, context._unit([0.98, 0.2, 0.0])),
+        Passage("abstract", "a copy", 0.9, context._unit([0.98, 0.201, 0.0])),
+        Passage("chunk", "b", 0.8, context._unit([0.9, 0.436, 0.0])),
+        Passage("chunk", "c", 0.7, context._unit([0.8, -0.2, 0.566])),
+    ]
+
+    ordered = mmr_order([1.0, 0.0, 0.0], passages, mmr_lambda=0.5, duplicate_threshold=0.99)
+
+    assert [p.text for p in ordered] == ["a", "c", "b"]
+
+
+def test_pack_context_fills_budget_in_mmr_order():
+    chunks = [_chunk(f"{i}_p1", "x" * 400, score=0.9 - i / 10) for i in range(5)]
+    abstracts = [{"text": "Title: t\n\nAbstract: " + "y" * 400, "score": 0.95}]
+
+    packed_abstracts, packed_chunks = pack_context([0.1], chunks, abstracts, budget=250)
+
+    assert len(packed_abstracts) == 1
+    assert len(packed_chunks) == 1
+    assert not packed_chunks[0].startswith("search_document: ")
+    assert pack_context([0.1], chunks, abstracts, budget=None)[1] == ["x" * 400] * 5
+
+
+def test_context_budget_subtracts_prediction_and_prompt():
+    assert context_budget(8192, 2048, 1000) == 8192 - 2048 - 1000 - context.CONTEXT_RESERVE_TOKENS
+    assert context_budget(1024, 2048, 0) == 0
+    assert context_budget(None, 2048) is None
+
+
+def test_pack_context_accepts_float32_embeddings():
+    chunks = [_chunk("0_p1", "a", embedding=np.array([1.0, 0.0], dtype=np.float32))]
+    abstracts = [{"text": "b", "score": 0.8, "embedding": np.array([1.0, 0.0], dtype=np.float32)}]
+
+    # Identical vectors: the abstract is dropped as a near-duplicate of the chunk
+    assert pack_context([1.0, 0.0], chunks, abstracts) == ([], ["a"])
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+import pytest
+
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict
+
+from kg.llm import conversation
+from kg.llm.conversation import ChatHistory, create_chat_engine, get_session_summary, list_all_sessions
+
+
+def test_engine_uses_wal(tmp_path):
+    engine = create_chat_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_writes_maintain_session_summary(tmp_path):
+    engine = create_chat_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    history = ChatHistory("s1", connection=engine)
+    history.add_messages([HumanMessage(content="hello", additional_kwargs={"timestamp": "t1"}), AIMessage(content="hi")])
+    history.add_messages([HumanMessage(content="again", additional_kwargs={"timestamp": "t2"})])
+    ChatHistory("s2", connection=engine).add_messages([HumanMessage(content="other")])
+
+    assert sorted(list_all_sessions(engine)) == ["s1", "s2"]
+    assert get_session_summary("s1", engine) == {
+        "session_id": "s1",
+        "message_count": 3,
+        "first_message": "hello",
+        "last_message": "again",
+        "last_timestamp": "t2",
+    }
+    assert [m.content for m in ChatHistory("s1", connection=engine).messages] == ["hello", "hi", "again"]
+
+    history.clear()
+    assert list_all_sessions(engine) == ["s2"]
+    assert get_session_summary("s1", engine)["message_count"] == 0
+
+
+def test_existing_messages_are_backfilled(tmp_path):
+    path = tmp_path / "chat.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE message_store (id INTEGER PRIMARY KEY, session_id TEXT, message TEXT)")
+    for session_id, message in [("s1", HumanMessage(content="first")), ("s1", AIMessage(content="last"))]:
+        conn.execute("INSERT INTO message_store (session_id, message) VALUES (?, ?)", (session_id, json.dumps(message_to_dict(message))))
+    conn.commit()
+    conn.close()
+
+    engine = create_chat_engine(f"sqlite:///{path}")
+    summary = get_session_summary("s1", engine)
+
+    assert summary["message_count"] == 2
+    assert (summary["first_message"], summary["last_message"]) == ("first", "last")
+    with engine.connect() as conn:
+        indexes = [row[1] for row in conn.exec_driver_sql("PRAGMA index_list(message_store)")]
+    assert "ix_message_store_session_id" in indexes
+
+
+def test_session_histories_share_one_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation, "CHAT_DB_URL", f"sqlite:///{tmp_path / 'chat.db'}")
+    monkeypatch.setattr(conversation, "_engine", None)
+
+    first = conversation.get_session_history("a")
+    second = conversation.get_session_history("b")
+
+    assert first.engine is second.engine
+
+
+def test_restore_discards_writes_made_after_backup(tmp_path, monkeypatch):
+    path = str(tmp_path / "chat.db")
+    monkeypatch.setattr(conversation, "_engine", create_chat_engine(f"sqlite:///{path}"))
+    backup = str(tmp_path / "backup.db")
+
+    conversation.get_session_history("a").add_messages([HumanMessage(content="kept")])
+    conversation.backup_conversations(backup)
+    conversation.get_session_history("b").add_messages([HumanMessage(content=f"m{i}") for i in range(50)])
+
+    conversation.restore_conversation_from_backup(backup, path)
+
+    assert list_all_sessions() == ["a"]
+    assert conversation.get_conversation_history("b") == []
+    assert [m.content for m in conversation.get_conversation_history("a")] == ["kept"]
+
+
+def test_restore_rejects_other_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation, "_engine", create_chat_engine(f"sqlite:///{tmp_path / 'chat.db'}"))
+
+    with pytest.raises(ValueError):
+        conversation.restore_conversation_from_backup(str(tmp_path / "backup.db"), str(tmp_path / "other.db"))
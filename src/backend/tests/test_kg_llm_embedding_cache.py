@@ -0,0 +1,83 @@
+import pytest
+
+from kg.llm import embedding_cache
+from kg.llm.adapter import NomicEmbeddingAdapter
+from kg.llm.embedding_cache import EmbeddingCache
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 0.5]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    yield cache
+    cache.close()
+
+
+def test_text_key_separates_task_prefix_from_text_hash():
+    query_prefix, query_hash = embedding_cache.text_key("search_query: graphs")
+    doc_prefix, doc_hash = embedding_cache.text_key("search_document: graphs")
+
+    assert (query_prefix, doc_prefix) == ("search_query: ", "search_document: ")
+    assert query_hash == doc_hash
+    assert embedding_cache.text_key("graphs") == ("", query_hash)
+
+
+def test_round_trips_vectors_per_model(cache):
+    cache.set_many("nomic", [("search_document: a", [0.25, -1.5])])
+
+    assert cache.get_many("nomic", ["search_document: a", "search_query: a"]) == {"search_document: a": [0.25, -1.5]}
+    assert cache.get_many("other-model", ["search_document: a"]) == {}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_float16_blobs_are_half_the_size(tmp_path):
+    small = EmbeddingCache(str(tmp_path / "f16.db"), dtype="float16")
+    small.set_many("nomic", [("a", [0.5] * 8)])
+
+    assert small.size() == 16
+    assert small.get_many("nomic", ["a"]) == {"a": [0.5] * 8}
+    small.close()
+
+
+def test_evicts_least_recently_used_vectors(tmp_path, monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock["now"])
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_bytes=2 * 4 * 4)
+
+    for text in ("old", "recent"):
+        cache.set_many("nomic", [(text, [1.0] * 4)])
+        clock["now"] += 1
+    cache.get_many("nomic", ["old"])
+    clock["now"] += 1
+    cache.set_many("nomic", [("new", [1.0] * 4)])
+
+    assert set(cache.get_many("nomic", ["old", "recent", "new"])) == {"old", "new"}
+    assert cache.size() == 2 * 4 * 4
+    cache.close()
+
+
+def test_adapter_only_embeds_uncached_texts(cache):
+    adapter = NomicEmbeddingAdapter(model_id="nomic", cache=cache)
+    adapter.embeddings = FakeEmbeddings()
+
+    first = adapter.embed_documents(["a", "bb", "a"])
+    second = adapter.embed_documents(["bb", "ccc"])
+    query = adapter.embed_query("ccc")
+
+    assert first == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5]]
+    assert query == [3.0, 0.5]
+    assert adapter.embeddings.calls == [["a", "bb"], ["ccc"]]
@@ -0,0 +1,95 @@
+import pytest
+
+from kg.db.writer import BatchWriteResult
+from kg.llm import embeddings
+
+
+class FakeSplitter:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def split_text(self, _text):
+        return self.parts
+
+
+class FakeAdapter:
+    def __init__(self, *args, fail_batches=False, bad_text=None, **kwargs):
+        self.batch_calls = []
+        self.query_calls = []
+        self.fail_batches = fail_batches
+        self.bad_text = bad_text
+
+    def embed_documents(self, texts):
+        self.batch_calls.append(texts)
+        if self.fail_batches:
+            raise RuntimeError("batch too large")
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        if text == self.bad_text:
+            raise RuntimeError("context length exceeded")
+        return [float(len(text))]
+
+
+def test_paper_data_from_file_prefixes_chunks_and_drops_references():
+    chunks = embeddings.paper_data_from_file("body\nReferences\n[1] x", "p1", FakeSplitter(["a", "b"]))
+
+    assert chunks == [
+        {"text": "search_document: a", "paper_id": "p1", "chunkId": "0_p1"},
+        {"text": "search_document: b", "paper_id": "p1", "chunkId": "1_p1"},
+    ]
+
+
+def test_embed_chunk_batch_falls_back_to_single_requests():
+    adapter = FakeAdapter(fail_batches=True, bad_text="bad")
+    chunks = [{"text": "ok", "chunkId": "0"}, {"text": "bad", "chunkId": "1"}]
+
+    embedded = embeddings.embed_chunk_batch(adapter, chunks)
+
+    assert embedded == [(chunks[0], [2.0])]
+    assert adapter.query_calls == ["ok", "bad"]
+
+
+@pytest.mark.asyncio
+async def test_create_chunk_nodes_embeds_and_writes_in_batches(monkeypatch):
+    adapter = FakeAdapter()
+    writes = []
+
+    async def fake_write_chunks(rows, previous_chunk_id=None):
+        writes.append(([row["chunkId"] for row in rows], previous_chunk_id))
+        return BatchWriteResult(relation="Chunk", batch=0, rows=len(rows), written=len(rows))
+
+    monkeypatch.setattr(embeddings, "NomicEmbeddingAdapter", lambda model_id: adapter)
+    monkeypatch.setattr(embeddings, "write_chunks", fake_write_chunks)
+
+    count = await embeddings.create_chunk_nodes_with_embeddings(
+        "text", "p1", FakeSplitter(["a", "b", "c"]), batch_size=2
+    )
+
+    assert count == 3
+    assert len(adapter.batch_calls) == 2
+    assert writes == [(["0_p1", "1_p1"], None), (["2_p1"], "1_p1")]
+
+
+@pytest.mark.asyncio
+async def test_create_abstract_embeddings_reuses_one_adapter_in_batches(monkeypatch):
+    adapters = []
+
+    def make_adapter(model_id):
+        adapters.append(FakeAdapter(fail_batches=len(adapters) > 0))
+        return adapters[-1]
+
+    monkeypatch.setattr(embeddings, "NomicEmbeddingAdapter", make_adapter)
+
+    result = await embeddings.create_abstract_embeddings(["a", "bb", "ccc"], batch_size=2)
+
+    assert result == [[1.0], [2.0], [3.0]]
+    assert len(adapters) == 1
+    assert adapters[0].batch_calls == [["a", "bb"], ["ccc"]]
+
+
+def test_embed_text_batch_keeps_positions_of_failed_texts():
+    adapter = FakeAdapter(fail_batches=True, bad_text="bad")
+
+    assert embeddings.embed_text_batch(adapter, ["ok", "bad", "fine"]) == [[2.0], None, [4.0]]
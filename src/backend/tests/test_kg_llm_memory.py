@@ -0,0 +1,102 @@
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from kg.llm import tokens
+from kg.llm.conversation import ChatHistory, create_chat_engine
+from kg.llm.memory import SummaryStore, WindowedChatHistory
+
+
+def _turns(count, size=10):
+    messages = []
+    for i in range(count):
+        messages.append(HumanMessage(content=f"q{i}".ljust(size, ".")))
+        messages.append(AIMessage(content=f"a{i}".ljust(size, ".")))
+    return messages
+
+
+def _history(tmp_path, summarizer=None, **kwargs):
+    store = InMemoryChatMessageHistory()
+    summaries = SummaryStore(str(tmp_path / "chat.db"))
+    return WindowedChatHistory("chat-1", store, summaries, summarizer, executor=None, **kwargs), store, summaries
+
+
+def test_estimate_tokens_is_about_four_characters_per_token():
+    assert tokens.estimate_tokens("") == 0
+    assert tokens.estimate_tokens("a" * 400) == 101
+
+
+def test_keeps_only_last_turns_without_summary(tmp_path):
+    history, store, _ = _history(tmp_path, window_turns=2)
+    store.add_messages(_turns(5))
+
+    assert [m.content[:2] for m in history.messages] == ["q3", "a3", "q4", "a4"]
+
+
+def test_summarizes_messages_that_leave_the_window(tmp_path):
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append((summary, [m.content[:2] for m in messages]))
+        return f"{summary}+{len(messages)}"
+
+    history, _, summaries = _history(tmp_path, summarizer, window_turns=1)
+    history.add_messages(_turns(2))
+    history.add_messages(_turns(1))
+
+    assert calls == [("", ["q0", "a0"]), ("+2", ["q1", "a1"])]
+    assert summaries.get("chat-1") == (4, "+2+2")
+    messages = history.messages
+    assert isinstance(messages[0], SystemMessage) and messages[0].content.endswith("+2+2")
+    assert [m.content[:2] for m in messages[1:]] == ["q0", "a0"]
+
+
+def test_unsummarized_messages_stay_verbatim_and_budget_drops_oldest(tmp_path):
+    history, store, summaries = _history(tmp_path, lambda summary, messages: summary, window_turns=1, token_budget=12)
+    store.add_messages(_turns(4, size=20))
+
+    assert [m.content[:2] for m in history.messages] == ["q3", "a3"]
+
+    summaries.set("chat-1", 2, "earlier")
+    history.token_budget = 1000
+    assert [m.content[:2] for m in history.messages[1:]] == ["q1", "a1", "q2", "a2", "q3", "a3"]
+
+
+def test_summary_cache_survives_new_store_instance(tmp_path):
+    first = SummaryStore(str(tmp_path / "chat.db"))
+    first.set("chat-1", 6, "summary")
+
+    assert SummaryStore(str(tmp_path / "chat.db")).get("chat-1") == (6, "summary")
+
+
+def test_clear_removes_summary(tmp_path):
+    history, store, summaries = _history(tmp_path)
+    store.add_messages(_turns(1))
+    summaries.set("chat-1", 2, "summary")
+
+    history.clear()
+
+    assert store.messages == []
+    assert summaries.get("chat-1") == (0, "")
+
+
+def test_sql_store_reads_only_window_and_unsummarized_rows(tmp_path, monkeypatch):
+    store = ChatHistory("chat-1", connection=create_chat_engine(f"sqlite:///{tmp_path / 'chat.db'}"))
+    summaries = SummaryStore(str(tmp_path / "summaries.db"))
+    folded = []
+
+    def summarizer(summary, messages):
+        folded.append([m.content[:2] for m in messages])
+        return "earlier"
+
+    history = WindowedChatHistory("chat-1", store, summaries, summarizer, window_turns=1, executor=None)
+    history.add_messages(_turns(3))
+
+    def load_everything(self):
+        raise AssertionError("full history loaded")
+
+    monkeypatch.setattr(ChatHistory, "messages", property(load_everything))
+    history.add_messages(_turns(1))
+
+    assert folded == [["q0", "a0", "q1", "a1"], ["q2", "a2"]]
+    assert [m.content[:2] for m in history.messages[1:]] == ["q0", "a0"]
+    assert store.get_messages(1, 3)[0].content[:2] == "a0"
@@ -0,0 +1,42 @@
+from kg.llm import retrieval_cache
+from kg.llm.retrieval_cache import LRUCache, embedding_hash, normalize_question
+
+
+def test_normalize_question_ignores_case_and_whitespace():
+    assert normalize_question("  What is  NEW?\n") == normalize_question("what is new?")
+
+
+def test_embedding_hash_depends_on_values():
+    assert embedding_hash([0.1, 0.2]) == embedding_hash([0.1, 0.2])
+    assert embedding_hash([0.1, 0.2]) != embedding_hash([0.2, 0.1])
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retrieval_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+
+    now[0] = 105.0
+    assert cache.get("a") == 1
+    now[0] = 111.0
+    assert cache.get("a") is None
+
+
+def test_results_from_before_an_invalidation_are_not_stored():
+    cache = LRUCache(max_size=2)
+    generation = cache.generation
+    cache.clear()
+    cache.set("a", 1, generation)
+
+    assert cache.get("a") is None
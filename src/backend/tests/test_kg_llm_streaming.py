@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from kg.llm import streaming
+from kg.llm.streaming import TokenCoalescer
+
+
+@pytest.fixture
+def flushed():
+    out = []
+
+    async def flush(text):
+        out.append(text)
+
+    return out, flush
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_byte_threshold_is_reached(flushed):
+    out, flush = flushed
+    coalescer = TokenCoalescer(flush, interval=10, max_bytes=5)
+
+    for token in ["ab", "cd", "ef", "g"]:
+        await coalescer.add(token)
+    await coalescer.close()
+
+    assert out == ["abcdef", "g"]
+    assert coalescer.flushes == 2
+
+
+@pytest.mark.asyncio
+async def test_timer_flushes_buffer_after_interval(flushed):
+    out, flush = flushed
+    coalescer = TokenCoalescer(flush, interval=0.01, max_bytes=1000)
+
+    await coalescer.add("first")
+    await coalescer.add(" token")
+    assert out == []
+    await asyncio.sleep(0.05)
+
+    assert out == ["first token"]
+
+
+@pytest.mark.asyncio
+async def test_flushes_inline_when_producer_blocks_the_loop(flushed, monkeypatch):
+    out, flush = flushed
+    clock = {"now": 0.0}
+    monkeypatch.setattr(streaming.time, "monotonic", lambda: clock["now"])
+    coalescer = TokenCoalescer(flush, interval=0.05, max_bytes=1000)
+
+    await coalescer.add("a")
+    clock["now"] = 0.06
+    await coalescer.add("b")
+    await coalescer.add("c")
+    await coalescer.close()
+
+    assert out == ["ab", "c"]
+
+
+@pytest.mark.asyncio
+async def test_close_without_tokens_does_not_flush(flushed):
+    out, flush = flushed
+    coalescer = TokenCoalescer(flush)
+
+    await coalescer.add("")
+    await coalescer.close()
+
+    assert out == []
@@ -1,5 +1,7 @@
+import asyncio
 import importlib
 import sys
+import threading
 import types
 
 import pytest
@@ -14,8 +16,12 @@ def _load_rabbit_main_with_stubs(monkeypatch):
     aio_pika = types.ModuleType("aio_pika")
 
     class FakeMessage:
-        def __init__(self, body):
+        def __init__(self, body, delivery_mode=None):
             self.body = body
+            self.delivery_mode = delivery_mode
+
+    class FakeDeliveryMode:
+        PERSISTENT = 2
 
     class FakeExchangeType:
         FANOUT = "fanout"
@@ -27,6 +33,7 @@ def _load_rabbit_main_with_stubs(monkeypatch):
     aio_pika.Message = FakeMessage
     aio_pika.ExchangeType = FakeExchangeType
     aio_pika.Channel = object
+    aio_pika.DeliveryMode = FakeDeliveryMode
 
     monkeypatch.setitem(sys.modules, "aio_pika", aio_pika)
     sys.modules.pop("rabbit.main", None)
@@ -105,3 +112,261 @@ async def test_publish_message_declares_fanout_exchange_and_publishes(monkeypatc
 
     assert calls["declare"] == [("CHAT_MESSAGE.broadcast", "fanout", True)]
     assert calls["publish"] == [(b'{"value":"hello"}', "")]
+
+
+class RecordingExchange:
+    def __init__(self, calls, fail_times=0):
+        self.calls = calls
+        self.fail_times = fail_times
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(0)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("channel closed")
+        self.calls["publish"].append(message.body)
+
+
+class RecordingConnection:
+    def __init__(self, calls, fail_times=0):
+        self.calls = calls
+        self.fail_times = fail_times
+        self.closed = False
+
+    async def channel(self):
+        calls = self.calls
+        exchange = RecordingExchange(calls, self.fail_times)
+
+        class Channel:
+            async def declare_exchange(self, name, exchange_type, durable):
+                calls["declare"].append(name)
+                return exchange
+
+        return Channel()
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_publisher_reuses_connection_channel_and_exchange(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    calls = {"connect": 0, "declare": [], "publish": []}
+
+    async def fake_create_connection():
+        calls["connect"] += 1
+        return RecordingConnection(calls)
+
+    monkeypatch.setattr(rabbit_main, "create_connection", fake_create_connection)
+    publisher = rabbit_main.Publisher(connection_count=1, channel_count=1)
+
+    for i in range(3):
+        await publisher.publish(rabbit_main.ChannelType.CHAT_RESPONSE, TestMessage(value=str(i)))
+
+    assert calls["connect"] == 1
+    assert calls["declare"] == ["CHAT_RESPONSE.broadcast"]
+    assert len(calls["publish"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_publisher_reconnects_after_failed_publish(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    calls = {"connect": 0, "declare": [], "publish": []}
+    connections = []
+
+    async def fake_create_connection():
+        calls["connect"] += 1
+        connection = RecordingConnection(calls, fail_times=1 if not connections else 0)
+        connections.append(connection)
+        return connection
+
+    monkeypatch.setattr(rabbit_main, "create_connection", fake_create_connection)
+    publisher = rabbit_main.Publisher(connection_count=1, channel_count=1)
+
+    await publisher.publish(rabbit_main.ChannelType.GRAPH_UPDATED, TestMessage(value="x"))
+
+    assert calls["connect"] == 2
+    assert connections[0].closed is True
+    assert calls["publish"] == [b'{"value":"x"}']
+
+
+@pytest.mark.asyncio
+async def test_concurrent_failed_publishes_rebuild_pool_once(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    calls = {"connect": 0, "declare": [], "publish": []}
+    connections = []
+
+    async def fake_create_connection():
+        calls["connect"] += 1
+        connection = RecordingConnection(calls, fail_times=1 if not connections else 0)
+        connections.append(connection)
+        return connection
+
+    monkeypatch.setattr(rabbit_main, "create_connection", fake_create_connection)
+    publisher = rabbit_main.Publisher(connection_count=1, channel_count=3)
+
+    await asyncio.gather(*(
+        publisher.publish(rabbit_main.ChannelType.CHAT_RESPONSE, TestMessage(value=str(i))) for i in range(3)
+    ))
+
+    assert calls["connect"] == 2
+    assert [c.closed for c in connections] == [True, False]
+    assert len(calls["publish"]) == 3
+
+
+class _FakeIncoming:
+    def __init__(self, body, log):
+        self.body = body
+        self.log = log
+
+    def process(self):
+        message = self
+
+        class Process:
+            async def __aenter__(self):
+                return message
+
+            async def __aexit__(self, exc_type, exc, tb):
+                message.log.append(("ack" if exc is None else "reject", message.body))
+                return False
+
+        return Process()
+
+
+def _fake_consumer_connection(bodies, log, qos, declared=None):
+    class QueueIterator:
+        def __init__(self):
+            self.messages = [_FakeIncoming(body, log) for body in bodies]
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not self.messages:
+                # Let in-flight handlers finish before the stream ends
+                await asyncio.sleep(0.05)
+                raise StopAsyncIteration
+            return self.messages.pop(0)
+
+    class FakeQueue:
+        async def bind(self, exchange):
+            pass
+
+        def iterator(self):
+            return QueueIterator()
+
+    class FakeChannel:
+        async def set_qos(self, prefetch_count):
+            qos.append(prefetch_count)
+
+        async def declare_exchange(self, *args, **kwargs):
+            return object()
+
+        async def declare_queue(self, *args, **kwargs):
+            if declared is not None:
+                declared.append((args, kwargs))
+            return FakeQueue()
+
+    class FakeConnection:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        async def channel(self):
+            return FakeChannel()
+
+    async def create_connection():
+        return FakeConnection()
+
+    return create_connection
+
+
+@pytest.mark.asyncio
+async def test_subscribe_to_queue_runs_callbacks_concurrently_up_to_limit(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    log, qos = [], []
+    bodies = [TestMessage(value=str(i)).json().encode() for i in range(4)]
+    monkeypatch.setattr(rabbit_main, "create_connection", _fake_consumer_connection(bodies, log, qos))
+    running = {"now": 0, "max": 0}
+
+    async def callback(message):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        if message.value == "2":
+            raise RuntimeError("boom")
+
+    await rabbit_main.subscribe_to_queue(rabbit_main.ChannelType.ADD_PAPER, callback, TestMessage, concurrency=2)
+
+    assert qos == [2]
+    assert running["max"] == 2
+    assert sorted(log) == sorted([("ack", bodies[0]), ("ack", bodies[1]), ("reject", bodies[2]), ("ack", bodies[3])])
+
+
+@pytest.mark.asyncio
+async def test_subscribe_to_queue_with_concurrency_one_preserves_order(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    log, qos = [], []
+    bodies = [TestMessage(value=str(i)).json().encode() for i in range(3)]
+    monkeypatch.setattr(rabbit_main, "create_connection", _fake_consumer_connection(bodies, log, qos))
+    seen = []
+
+    async def callback(message):
+        seen.append(message.value)
+
+    await rabbit_main.subscribe_to_queue(rabbit_main.ChannelType.CHAT_RESPONSE, callback, TestMessage, concurrency=1, prefetch_count=5)
+
+    assert qos == [5]
+    assert seen == ["0", "1", "2"]
+
+
+def test_channel_concurrency_reads_per_channel_override(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    monkeypatch.setenv("RABBITMQ_ADD_CITATIONS_CONCURRENCY", "6")
+
+    assert rabbit_main.channel_concurrency(rabbit_main.ChannelType.ADD_CITATIONS, 2) == 6
+    assert rabbit_main.channel_concurrency(rabbit_main.ChannelType.ADD_PAPER, 2) == 2
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_returns_result_from_executor(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+
+    result = await rabbit_main.run_blocking(lambda a, b: (a + b, threading.current_thread().name), 1, 2)
+
+    assert result[0] == 3
+    assert result[1] != threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_command_channels_share_a_durable_work_queue(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+    declared = []
+    monkeypatch.setattr(rabbit_main, "create_connection", _fake_consumer_connection([], [], [], declared))
+
+    async def callback(message):
+        pass
+
+    await rabbit_main.subscribe_to_queue(rabbit_main.ChannelType.ADD_PAPER, callback, TestMessage)
+    await rabbit_main.subscribe_to_queue(rabbit_main.ChannelType.GRAPH_UPDATED, callback, TestMessage)
+
+    assert declared == [(("ADD_PAPER.work",), {"durable": True}), ((), {"exclusive": True})]
+
+
+def test_make_message_persists_only_commands(monkeypatch):
+    rabbit_main = _load_rabbit_main_with_stubs(monkeypatch)
+
+    command = rabbit_main.make_message(rabbit_main.ChannelType.CHAT_MESSAGE_CREATED, TestMessage(value="q"))
+    event = rabbit_main.make_message(rabbit_main.ChannelType.GRAPH_UPDATED, TestMessage(value="e"))
+
+    assert command.delivery_mode == 2
+    assert event.delivery_mode is None
@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+from scholar import api as scholar_api
+
+
+class PagedClient:
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+
+    async def get(self, path, params=None):
+        self.requests.append((path, dict(params)))
+        offset, limit = params["offset"], params["limit"]
+        end = min(offset + limit, self.total)
+        body = {
+            "offset": offset,
+            "data": [{"citingPaper": {"paperId": f"c{i}", "title": f"Citing {i}"}} for i in range(offset, end)],
+        }
+        if end < self.total:
+            body["next"] = end
+        return httpx.Response(200, json=body, request=httpx.Request("GET", f"https://s2.test{path}"))
+
+
+@pytest.fixture
+def paged_client(monkeypatch):
+    def install(total):
+        client = PagedClient(total)
+        monkeypatch.setattr(scholar_api, "get_cache", lambda: None)
+        monkeypatch.setattr(scholar_api, "get_client", lambda: client)
+        return client
+    return install
+
+
+@pytest.mark.asyncio
+async def test_iter_citations_follows_next_offsets(paged_client):
+    client = paged_client(5)
+
+    pages = [[c.paperId for c in page] async for page in scholar_api.iter_citations("p1", page_size=2)]
+
+    assert pages == [["c0", "c1"], ["c2", "c3"], ["c4"]]
+    assert [params["offset"] for _, params in client.requests] == [0, 2, 4]
+    assert client.requests[0][0] == "/graph/v1/paper/p1/citations"
+
+
+@pytest.mark.asyncio
+async def test_iter_citations_stops_at_max_results(paged_client):
+    client = paged_client(10)
+
+    citations = await scholar_api.get_citations("p1", max_results=3)
+
+    assert [c.paperId for c in citations] == ["c0", "c1", "c2"]
+    assert client.requests == [("/graph/v1/paper/p1/citations", {"offset": 0, "limit": 3})]
+
+
+@pytest.mark.asyncio
+async def test_iter_citations_stops_on_error(monkeypatch):
+    class FailingClient:
+        async def get(self, path, params=None):
+            return httpx.Response(404, request=httpx.Request("GET", f"https://s2.test{path}"))
+
+    monkeypatch.setattr(scholar_api, "get_cache", lambda: None)
+    monkeypatch.setattr(scholar_api, "get_client", lambda: FailingClient())
+
+    assert await scholar_api.get_citations("missing") == []
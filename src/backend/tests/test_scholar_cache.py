@@ -0,0 +1,166 @@
+import httpx
+import pytest
+
+from scholar import api as scholar_api
+from scholar import cache as scholar_cache
+from scholar.cache import ResponseCache
+
+
+class FakeClient:
+    def __init__(self, records):
+        self.records = records
+        self.requested = []
+
+    async def post(self, path, params=None, json=None):
+        self.requested.append(list(json["ids"]))
+        request = httpx.Request("POST", f"https://s2.test{path}")
+        return httpx.Response(200, json=[self.records.get(i) for i in json["ids"]], request=request)
+
+
+def _author(author_id):
+    return {"authorId": author_id, "name": f"Author {author_id}"}
+
+
+def test_make_key_depends_on_endpoint_id_and_params():
+    key = ResponseCache.make_key("paper/batch", "p1", {"fields": "title"})
+
+    assert key == ResponseCache.make_key("paper/batch", "p1", {"fields": "title"})
+    assert key != ResponseCache.make_key("paper/batch", "p2", {"fields": "title"})
+    assert key != ResponseCache.make_key("paper/batch", "p1", {"fields": "title,year"})
+    assert key != ResponseCache.make_key("author/batch", "p1", {"fields": "title"})
+
+
+def test_get_many_counts_hits_and_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "s2.db"))
+    cache.set_many("paper/batch", {"a": {"paperId": "a"}, "b": {"paperId": "b"}})
+
+    found = cache.get_many("paper/batch", ["a", "b", "c"])
+
+    assert found == {"a": {"paperId": "a"}, "b": {"paperId": "b"}}
+    assert cache.stats()["hits"] == {"paper/batch": 2}
+    assert cache.stats()["misses"] == {"paper/batch": 1}
+    cache.close()
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = ResponseCache(str(tmp_path / "s2.db"), ttls={"paper/citations": -1})
+    cache.set("paper/citations", "p1", [{"citingPaper": {"paperId": "x"}}])
+
+    assert cache.get("paper/citations", "p1") is None
+    # Expired rows are swept periodically rather than on every write
+    assert cache.size() > 0
+    cache.evict()
+    assert cache.size() == 0
+    cache.close()
+
+
+def test_size_is_tracked_across_replacements_and_reopening(tmp_path):
+    path = str(tmp_path / "s2.db")
+    cache = ResponseCache(path)
+    cache.set("paper/batch", "p1", {"data": "x" * 10})
+    cache.set("paper/batch", "p1", {"data": "x" * 100})
+    cache.set("paper/batch", "p2", {"data": "y"})
+    expected = len(scholar_cache.json.dumps({"data": "x" * 100})) + len(scholar_cache.json.dumps({"data": "y"}))
+
+    assert cache.size() == expected
+    cache.close()
+    assert ResponseCache(path).size() == expected
+
+
+def test_evicts_least_recently_used_entries_over_budget(tmp_path, monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(scholar_cache.time, "time", lambda: clock["now"])
+    value = {"data": "x" * 100}
+    entry_size = len(scholar_cache.json.dumps(value))
+    cache = ResponseCache(str(tmp_path / "s2.db"), max_bytes=entry_size * 2)
+
+    cache.set("paper/batch", "old", value)
+    clock["now"] += 1
+    cache.set("paper/batch", "recent", value)
+    clock["now"] += 1
+    cache.get("paper/batch", "old")
+    clock["now"] += 1
+    cache.set("paper/batch", "new", value)
+
+    assert cache.get("paper/batch", "recent") is None
+    assert cache.get("paper/batch", "old") == value
+    assert cache.get("paper/batch", "new") == value
+    cache.close()
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "s2.db")
+    first = ResponseCache(path)
+    first.set("author/batch", "a1", _author("a1"))
+    first.close()
+
+    second = ResponseCache(path)
+    assert second.get("author/batch", "a1") == _author("a1")
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_enrich_authors_only_requests_uncached_ids(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "s2.db"))
+    client = FakeClient({"a1": _author("a1"), "a2": _author("a2")})
+    monkeypatch.setattr(scholar_api, "get_cache", lambda: cache)
+    monkeypatch.setattr(scholar_api, "get_client", lambda: client)
+
+    first = await scholar_api.enrich_authors(["a1", "missing"])
+    second = await scholar_api.enrich_authors(["a2", "a1"])
+
+    assert first[0].authorId == "a1" and first[1] is None
+    assert [a.authorId for a in second] == ["a2", "a1"]
+    assert client.requested == [["a1", "missing"], ["a2"]]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_enrich_authors_without_cache(monkeypatch):
+    client = FakeClient({"a1": _author("a1")})
+    monkeypatch.setattr(scholar_api, "get_cache", lambda: None)
+    monkeypatch.setattr(scholar_api, "get_client", lambda: client)
+
+    await scholar_api.enrich_authors(["a1"])
+    await scholar_api.enrich_authors(["a1"])
+
+    assert client.requested == [["a1"], ["a1"]]
+
+
+@pytest.mark.asyncio
+async def test_enrich_papers_splits_large_batches_and_keeps_input_order(monkeypatch):
+    records = {
+        f"p{i}": {
+            "paperId": f"p{i}",
+            "title": f"Paper {i}",
+            "abstract": None,
+            "venue": "",
+            "referenceCount": 0,
+            "citationCount": 0,
+            "influentialCitationCount": 0,
+        }
+        for i in range(7)
+    }
+    client = FakeClient(records)
+    monkeypatch.setattr(scholar_api, "get_cache", lambda: None)
+    monkeypatch.setattr(scholar_api, "get_client", lambda: client)
+    monkeypatch.setattr(scholar_api, "PAPER_BATCH_LIMIT", 3)
+    ids = ["p6", "unknown", "p0", "p1", "p2", "p3", "p4", "p5"]
+
+    papers = await scholar_api.enrich_papers(ids)
+
+    assert [p.paperId if p else None for p in papers] == ["p6", None, "p0", "p1", "p2", "p3", "p4", "p5"]
+    assert client.requested == [["p6", "unknown", "p0"], ["p1", "p2", "p3"], ["p4", "p5"]]
+
+
+def test_evict_resyncs_size_with_other_writers(tmp_path):
+    path = str(tmp_path / "s2.db")
+    first = ResponseCache(path)
+    second = ResponseCache(path)
+    second.set("paper/batch", "p1", {"data": "x" * 100})
+
+    assert first.size() == 0
+    first.evict()
+    assert first.size() == second.size() > 0
+    first.close()
+    second.close()
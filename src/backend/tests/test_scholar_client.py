@@ -0,0 +1,98 @@
+import httpx
+import pytest
+
+from scholar import client as scholar_client
+from scholar.util import RateLimitExceededError
+
+
+class NoopLimiter:
+    async def acquire(self):
+        pass
+
+
+def _make_client(handler, **kwargs):
+    client = scholar_client.SemanticScholarClient(
+        base_url="https://s2.test",
+        api_key=None,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+    client.limiter = NoopLimiter()
+    return client
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(scholar_client, "jittered_delay", lambda attempt, base, cap: attempt)
+    monkeypatch.setattr(scholar_client.asyncio, "sleep", fake_sleep)
+    return sleeps
+
+
+@pytest.mark.asyncio
+async def test_request_retries_rate_limited_responses(no_sleep):
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        if calls["count"] < 3:
+            return httpx.Response(429)
+        return httpx.Response(200, json={"ok": True})
+
+    client = _make_client(handler, max_retries=5)
+    response = await client.get("/graph/v1/paper/search", params={"query": "x"})
+    await client.aclose()
+
+    assert response.json() == {"ok": True}
+    assert calls["count"] == 3
+    assert no_sleep == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_request_raises_after_exhausting_rate_limit_retries(no_sleep):
+    client = _make_client(lambda request: httpx.Response(429), max_retries=2)
+
+    with pytest.raises(RateLimitExceededError):
+        await client.get("/graph/v1/paper/search")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_request_returns_client_errors_without_retrying(no_sleep):
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(404)
+
+    client = _make_client(handler)
+    response = await client.get("/graph/v1/paper/missing")
+    await client.aclose()
+
+    assert response.status_code == 404
+    assert calls["count"] == 1
+    assert no_sleep == []
+
+
+@pytest.mark.asyncio
+async def test_api_key_is_sent_as_header():
+    seen = {}
+
+    def handler(request):
+        seen["key"] = request.headers.get("x-api-key")
+        return httpx.Response(200, json={})
+
+    client = scholar_client.SemanticScholarClient(
+        base_url="https://s2.test",
+        api_key="secret",
+        rate_limit=1000,
+        transport=httpx.MockTransport(handler),
+    )
+    await client.get("/graph/v1/paper/search")
+    await client.aclose()
+
+    assert seen["key"] == "secret"
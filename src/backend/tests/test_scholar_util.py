@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from scholar import util
@@ -81,3 +83,45 @@ async def test_retry_async_retries_then_returns(monkeypatch):
 def test_retry_reraises_unexpected_exception():
     with pytest.raises(ValueError, match="boom"):
         util.retry(lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+
+def test_jittered_delay_stays_within_capped_backoff(monkeypatch):
+    monkeypatch.setattr(util.random, "uniform", lambda low, high: high)
+
+    assert util.jittered_delay(1, base_delay=1, max_delay=8) == 1
+    assert util.jittered_delay(3, base_delay=1, max_delay=8) == 4
+    assert util.jittered_delay(10, base_delay=1, max_delay=8) == 8
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_when_empty(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        bucket.updated_at -= delay
+
+    monkeypatch.setattr(util.asyncio, "sleep", fake_sleep)
+    bucket = util.TokenBucket(rate=2, capacity=1)
+
+    await bucket.acquire()
+    await bucket.acquire()
+
+    assert len(sleeps) == 1
+    assert sleeps[0] == pytest.approx(0.5, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_requests_next_item_before_consumer_finishes():
+    events = []
+
+    async def produce():
+        for i in range(3):
+            events.append(f"produce {i}")
+            yield i
+
+    async for item in util.read_ahead(produce()):
+        await asyncio.sleep(0)
+        events.append(f"consumed {item}")
+
+    assert events == ["produce 0", "produce 1", "consumed 0", "produce 2", "consumed 1", "consumed 2"]